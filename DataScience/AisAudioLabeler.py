@@ -1,4 +1,5 @@
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import json
 import logging
@@ -8,7 +9,6 @@ import re
 import shutil
 import tarfile
 
-from matplotlib import pyplot as plt
 import numpy as np
 import pandas as pd
 
@@ -70,17 +70,8 @@ def download_buoy_objects(
     None
 
     """
-    # List the objects in the bucket
-    if prefix is None:
-        r = s3.list_objects(bucket)
-    else:
-        r = s3.list_objects(bucket, prefix=prefix)
-    if r is None:
-        return
-
-    # Consider each object
-    s3_objects = r["Contents"]
-    for s3_object in s3_objects:
+    # Consider each object in the bucket, as it is listed
+    for s3_object in s3.iter_objects(bucket, prefix=prefix):
         key = s3_object["Key"]
 
         # Skip objects for which the key does not contain the label
@@ -243,26 +234,33 @@ def get_hydrophone_metadata(inp_path):
         Audio stream entries
 
     """
-    entries = []
-    req_keys = set(["sample_rate", "duration"])
-    names = os.listdir(inp_path)
-    for name in names:
-        entry = lu.probe_audio_file(inp_path / name)
-        if not req_keys.issubset(set(entry.keys())):
-            continue
-
-        # Identify start timestamp from audio file name
+    # Identify start timestamp from audio file names, so only audio
+    # files are probed
+    names = []
+    start_timestamps = []
+    for name in os.listdir(inp_path):
         s = re.search(r"-([0-9]+)-[a-zA-Z]+\.", name)
         if s is None:
             continue
-        start_timestamp = s.group(1)
+        names.append(name)
+        start_timestamps.append(int(s.group(1)))
+
+    # Probe audio files concurrently, since each probe waits on an
+    # ffprobe process
+    with ThreadPoolExecutor() as executor:
+        probed = executor.map(lu.probe_audio_file, [inp_path / name for name in names])
+        entries = []
+        req_keys = set(["sample_rate", "duration"])
+        for name, start_timestamp, entry in zip(names, start_timestamps, probed):
+            if not req_keys.issubset(set(entry.keys())):
+                continue
 
-        # All values present, so convert and append
-        entry["sample_rate"] = int(entry["sample_rate"])
-        entry["duration"] = float(entry["duration"])
-        entry["name"] = name
-        entry["start_timestamp"] = int(start_timestamp)
-        entries.append(entry)
+            # All values present, so convert and append
+            entry["sample_rate"] = int(entry["sample_rate"])
+            entry["duration"] = float(entry["duration"])
+            entry["name"] = name
+            entry["start_timestamp"] = start_timestamp
+            entries.append(entry)
 
     hmd = pd.DataFrame(entries).sort_values(by=["start_timestamp"], ignore_index=True)
 
@@ -545,6 +543,10 @@ def plot_intervals(shp, hmd):
     None
 
     """
+    # Import pyplot only when plotting, so runs without plots never
+    # load matplotlib
+    from matplotlib import pyplot as plt
+
     fig, axs = plt.subplots(figsize=(10, 9), dpi=100)
 
     # Consider each ship
@@ -614,6 +616,8 @@ def plot_histogram(ais, max_n_ships, bins=100):
     None
 
     """
+    from matplotlib import pyplot as plt
+
     _, axs = plt.subplots(figsize=(10, 9), dpi=100)
     underway_dists = ais.loc[
         (ais["shipcount_uw"] <= max_n_ships) & (ais["shipcount_uw"] > 0)
@@ -757,23 +761,42 @@ def export_audio_clips(
             -1
         ]
         inp_path = data_home / hydrophone["name"] / hydrophone["label"] / "hydrophone"
-        if row_0["start_timestamp"] == row_1["start_timestamp"]:
-            # Get one audio file
-            audio = lu.get_audio_file(inp_path / row_0["name"])
-
-        else:
-            # Get two audio files and concatenate
-            audio_0 = lu.get_audio_file(inp_path / row_0["name"])
-            audio_1 = lu.get_audio_file(inp_path / row_1["name"])
-            audio = audio_0 + audio_1
-
-        # Export the audio clip labeled using attributes of the
-        # selected ship
         name = Path(row_0["name"]).stem
         start_t = (start_timestamp_0 - row_0["start_timestamp"]) * 1000  # [ms]
         stop_t = start_t + 540 * 1000  # [ms]
         wav_filename = f"{name}-{start_t}-{stop_t}-{mmsi_m}-{shiptype_m}-{status}-{distance_m:.1f}.wav"
-        lu.export_audio_clip(audio, start_t, stop_t, clip_home / wav_filename)
+        if row_0["start_timestamp"] == row_1["start_timestamp"]:
+            # Export the audio clip labeled using attributes of the
+            # selected ship from one audio file, by copying frames if
+            # a WAV file, or decoding only the clip otherwise
+            wav_path = inp_path / row_0["name"]
+            wav_header = None
+            if wav_path.suffix.lower() == ".wav":
+                wav_header = lu.get_wav_header(wav_path)
+            lu.export_audio_file_clip(
+                wav_path, wav_header, start_t, stop_t, clip_home / wav_filename
+            )
+
+        else:
+            # Concatenate two audio files, then export the audio clip
+            # labeled using attributes of the selected ship, by
+            # copying frames if WAV files with the same format
+            wav_paths = [inp_path / row_0["name"], inp_path / row_1["name"]]
+            wav_headers = None
+            if all(wav_path.suffix.lower() == ".wav" for wav_path in wav_paths):
+                wav_headers = [lu.get_wav_header(wav_path) for wav_path in wav_paths]
+            if wav_headers is not None and (
+                wav_headers[0]["fmt_chunk"] == wav_headers[1]["fmt_chunk"]
+            ):
+                lu.export_audio_clip_fast(
+                    wav_paths, wav_headers, start_t, stop_t, clip_home / wav_filename
+                )
+
+            else:
+                audio_0 = lu.get_audio_file(wav_paths[0])
+                audio_1 = lu.get_audio_file(wav_paths[1])
+                audio = audio_0 + audio_1
+                lu.export_audio_clip(audio, start_t, stop_t, clip_home / wav_filename)
         logger.info(f"Exported audio file {wav_filename}")
         n_clips += 1
 
@@ -804,8 +827,7 @@ def upload_audio_clips(upload_path, bucket, prefix=None):
                     key = "/".join([prefix, filepath.name])
                 else:
                     key = filepath.name
-                with open(filepath, "rb") as f:
-                    s3.put_object(f, bucket, key)
+                s3.upload_file(filepath, bucket, key)
 
 
 def main():
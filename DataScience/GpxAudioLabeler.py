@@ -1,21 +1,20 @@
 from argparse import ArgumentParser
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import itertools
 import logging
-import math
 import os
 from pathlib import Path
-import time
 
 from lxml import etree
-from matplotlib import pyplot as plt
 import numpy as np
 import pandas as pd
 
 import LabelerUtilities as lu
 
-# WGS84 parameters
-R_OPLUS = 6378137  # [m]
-F_INV = 298.257223563
+# GPX namespace, and elevation assigned to track points at which the
+# elevation was not recorded
+GPX_NS = "{http://www.topografix.com/GPX/1/1}"
+MISSING_ELE = str(-lu.R_OPLUS)
 
 # Logging configuration
 root_logger = logging.getLogger()
@@ -31,7 +30,7 @@ logger = logging.getLogger("GpxAudioLabeler")
 logger.setLevel(logging.INFO)
 
 
-def parse_source_gpx_file(inp_path, source):
+def parse_source_gpx_file(inp_path, source, dump_pretty=False):
     """Parse a GPX file having the following structure:
 
     <gpx xmlns="http://www.topografix.com/GPX/1/1" xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v1" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" creator="Suunto app" version="1.1" xsi:schemaLocation="http://www.topografix.com/GPX/1/1 http://www.topografix.com/GPX/1/1/gpx.xsd http://www.garmin.com/xmlschemas/TrackPointExtension/v1 http://www.garmin.com/xmlschemas/TrackPointExtensionv1.xsd">
@@ -64,6 +63,8 @@ def parse_source_gpx_file(inp_path, source):
         Path of the GPX file to parse
     source : dict
         The source configuration
+    dump_pretty : bool
+        Flag to write a pretty printed copy of the GPX file, or not
 
     Returns
     -------
@@ -82,101 +83,147 @@ def parse_source_gpx_file(inp_path, source):
     https://en.wikipedia.org/wiki/GPS_Exchange_Format
     """
     logger.info(f"Parsing {inp_path}")
-    # Parse input file
-    parser = etree.XMLParser(remove_blank_text=True)
-    tree = etree.parse(inp_path, parser)
-
-    # Pretty print input file locally
-    out_path = inp_path.with_name(inp_path.name.replace(".gpx", "-pretty.gpx"))
-    tree.write(out_path, pretty_print=True)
-
-    # Collect tracks
-    root = tree.getroot()
+    # Optionally pretty print input file locally
+    if dump_pretty:
+        parser = etree.XMLParser(remove_blank_text=True)
+        tree = etree.parse(str(inp_path), parser)
+        out_path = inp_path.with_name(inp_path.name.replace(".gpx", "-pretty.gpx"))
+        tree.write(str(out_path), pretty_print=True)
+
+    # Stream the input file once, collecting track point attributes
+    # and children as strings, and freeing each track point, track
+    # segment, and track once collected
     gpx = {}
     gpx["metadata"] = {}
     gpx["trks"] = []
-    for trk_element in root.iter("{http://www.topografix.com/GPX/1/1}trk"):
-
-        # Collect track segments
-        trk = {}
-        trk["name"] = trk_element.find("{http://www.topografix.com/GPX/1/1}name").text
-        trk["trksegs"] = []
-        for trkseg_element in root.iter("{http://www.topografix.com/GPX/1/1}trkseg"):
-
-            # Collect track points
+    trksegs = []
+    trkpts = {"lat": [], "lon": [], "ele": [], "time": []}
+    for _, element in etree.iterparse(
+        str(inp_path),
+        events=("end",),
+        tag=(f"{GPX_NS}trk", f"{GPX_NS}trkseg", f"{GPX_NS}trkpt"),
+        remove_blank_text=True,
+    ):
+        if element.tag == f"{GPX_NS}trkpt":
+            trkpts["lat"].append(element.get("lat"))
+            trkpts["lon"].append(element.get("lon"))
+
+            # Visit the children once, rather than searching for each
+            ele = MISSING_ELE
+            for child in element:
+                if child.tag == f"{GPX_NS}ele":
+                    ele = child.text
+                elif child.tag == f"{GPX_NS}time":
+                    trkpts["time"].append(child.text.rstrip("Z"))
+            trkpts["ele"].append(ele)
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+        elif element.tag == f"{GPX_NS}trkseg":
+
+            # Convert the track points of the current track segment in
+            # bulk, and in place where possible
             trkseg = {}
-            trkseg["lat"] = []
-            trkseg["lon"] = []
-            trkseg["ele"] = []
-            trkseg["time"] = []
-            start_time = None
-            for trkpt_element in trkseg_element.iter(
-                "{http://www.topografix.com/GPX/1/1}trkpt"
-            ):
-                trkseg["lat"].append(
-                    math.radians(float(trkpt_element.get("lat")))
-                )  # [rad]
-                trkseg["lon"].append(
-                    math.radians(float(trkpt_element.get("lon")))
-                )  # [rad]
-                ele_element = trkpt_element.find(
-                    "{http://www.topografix.com/GPX/1/1}ele"
-                )
-                if ele_element is not None:
-                    trkseg["ele"].append(float(ele_element.text))  # [m]
-                else:
-                    trkseg["ele"].append(-R_OPLUS)
-
-                cur_time = datetime.fromisoformat(
-                    trkpt_element.find("{http://www.topografix.com/GPX/1/1}time").text[
-                        :-1
-                    ]
-                )
-                if start_time is None:
-                    start_time = cur_time
-                    trkseg["time"].append(0.0)
-                else:
-                    trkseg["time"].append(
-                        (cur_time - start_time).total_seconds()
-                    )  # [s]
-
-            trk["trksegs"].append(trkseg)
-
-        gpx["trks"].append(trk)
-
-        # Assign longitude, latitude, elevation, and time from start of
-        # track
-        # TODO: Check single track and track segment assumption
-        _t = np.array(
-            gpx["trks"][0]["trksegs"][0]["time"]
-        )  # time from start of track [s]
-        _lambda = np.array(
-            gpx["trks"][0]["trksegs"][0]["lon"]
-        )  # geodetic longitude [rad]
-        _varphi = np.array(
-            gpx["trks"][0]["trksegs"][0]["lat"]
-        )  # geodetic latitude [rad]
-        _h = np.array(gpx["trks"][0]["trksegs"][0]["ele"])  # elevation [m]
-
-        # Ignore points at which the elevation was not recorded
-        vld_idx = np.logical_and(
-            np.logical_and(source["start_t"] < _t, _t < source["stop_t"]),
-            _h != -R_OPLUS,
-        )
-        logger.info(
-            f"Found {np.sum(vld_idx)} valid values out of all {_t.shape[0]} values"
-        )
-        vld_t = _t[vld_idx]
-        vld_lambda = _lambda[vld_idx]
-        vld_varphi = _varphi[vld_idx]
-        vld_h = _h[vld_idx]
+            trkseg["lat"] = np.array(trkpts["lat"], dtype=np.float64)
+            np.radians(trkseg["lat"], out=trkseg["lat"])  # [rad]
+            trkseg["lon"] = np.array(trkpts["lon"], dtype=np.float64)
+            np.radians(trkseg["lon"], out=trkseg["lon"])  # [rad]
+            trkseg["ele"] = np.array(trkpts["ele"], dtype=np.float64)  # [m]
+            cur_time = np.array(trkpts["time"], dtype="datetime64[us]")
+            trkseg["time"] = (cur_time - cur_time[:1]) / np.timedelta64(1, "s")  # [s]
+            trksegs.append(trkseg)
+            trkpts = {"lat": [], "lon": [], "ele": [], "time": []}
+            element.clear()
+
+        else:
+
+            # Collect the track segments of the current track
+            trk = {}
+            trk["name"] = element.findtext(f"{GPX_NS}name")
+            trk["trksegs"] = trksegs
+            gpx["trks"].append(trk)
+            trksegs = []
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+    # Assign longitude, latitude, elevation, and time from start of
+    # track
+    # TODO: Check single track and track segment assumption
+    _t = gpx["trks"][0]["trksegs"][0]["time"]  # time from start of track [s]
+    _lambda = gpx["trks"][0]["trksegs"][0]["lon"]  # geodetic longitude [rad]
+    _varphi = gpx["trks"][0]["trksegs"][0]["lat"]  # geodetic latitude [rad]
+    _h = gpx["trks"][0]["trksegs"][0]["ele"]  # elevation [m]
+
+    # Ignore points at which the elevation was not recorded
+    vld_idx = np.logical_and(
+        np.logical_and(source["start_t"] < _t, _t < source["stop_t"]),
+        _h != -lu.R_OPLUS,
+    )
+    logger.info(
+        f"Found {np.sum(vld_idx)} valid values out of all {_t.shape[0]} values"
+    )
+    vld_t = _t[vld_idx]
+    vld_lambda = _lambda[vld_idx]
+    vld_varphi = _varphi[vld_idx]
+    vld_h = _h[vld_idx]
 
     return gpx, vld_t, vld_lambda, vld_varphi, vld_h
 
 
+def find_clip_ranges(vld_t, indices, delta_t_max):
+    """Find the start and stop times of each time set, having more
+    than two times, in which successive times differ by no more than
+    the specified delta time, for each of a list of index sets in a
+    single pass.
+
+    Parameters
+    ----------
+    vld_t : numpy.ndarray
+        Time from start of track [s]
+    indices : [numpy.ndarray]
+        Indices of the times in each index set, in time order
+    delta_t_max : float
+        the maximum time delta between positions used to define a
+        contiguous audio sample [s]
+
+    Returns
+    -------
+    clip_bounds : numpy.ndarray
+        Bounds of the clips of each index set in the start and stop
+        time arrays
+    clip_start_t : numpy.ndarray
+        Start time of each clip [ms]
+    clip_stop_t : numpy.ndarray
+        Stop time of each clip [ms]
+    """
+    # Concatenate the times of all index sets, and split where
+    # successive times exceed the specified delta time, or the index
+    # set changes
+    lengths = np.array([idx.size for idx in indices], dtype=np.int64)
+    set_ids = np.repeat(np.arange(len(indices)), lengths)
+    dub_t = vld_t[np.concatenate(indices).astype(np.int64)]
+    breaks = (
+        np.flatnonzero((np.diff(dub_t) > delta_t_max) | (np.diff(set_ids) != 0)) + 1
+    )
+    starts = np.concatenate(([0], breaks))
+    stops = np.concatenate((breaks, [dub_t.size]))
+
+    # Keep time sets having more than two times
+    is_valid = stops - starts > 2
+    starts = starts[is_valid]
+    stops = stops[is_valid]
+    clip_bounds = np.searchsorted(set_ids[starts], np.arange(len(indices) + 1))
+    clip_start_t = (dub_t[starts] * 1000).astype(np.int64)
+    clip_stop_t = (dub_t[stops - 1] * 1000).astype(np.int64)
+    return clip_bounds, clip_start_t, clip_stop_t
+
+
 def slice_source_audio_by_cluster(
-    hydrophone,
-    audio,
+    hyd_name,
+    wav_path,
+    wav_header,
     hyd_max_start_t,
     hyd_min_stop_t,
     vld_t,
@@ -189,18 +236,22 @@ def slice_source_audio_by_cluster(
     n_clips_max,
     clip_home,
     do_plot=True,
+    do_plot_empty=False,
 ):
     """Slice source audio by heading, heading first derivative,
-    distance, and speed clusters. Optionally plot source track and
-    label the intersection of the heading, heading first derivative,
+    distance, and speed clusters. Optionally save a plot of the source
+    track labeling the intersection of the heading, heading first derivative,
     distance, and speed clusters.
 
     Parameters
     ----------
-    hydrophone : dict
-        The hydrophone configuration
-    audio : pydub.audio_segment.AudioSegment
-        The audio segment
+    hyd_name : str
+        The hydrophone name used to prefix clip files
+    wav_path : pathlib.Path()
+        Path of the hydrophone audio file
+    wav_header : dict or None
+        The WAV file header returned by LabelerUtilities.get_wav_header(),
+        or None for audio files of other types
     hyd_max_start_t : int
        Maximum start_t of all hydrophones [ms]
     hyd_min_stop_t : int
@@ -209,13 +260,13 @@ def slice_source_audio_by_cluster(
         Time from start of track [s]
     r_s_h : numpy.ndarray
         Source topocentric (east, north, zenith) position [m]
-    distance_clusters : sklearn.cluster.KMeans
+    distance_clusters : LabelerUtilities.KMeans1D
         Fitted estimator for distance
-    heading_clusters : sklearn.cluster.KMeans
+    heading_clusters : LabelerUtilities.KMeans1D
         Fitted estimator for heading
-    heading_dot_clusters : sklearn_extra.cluster.KMedoids
+    heading_dot_clusters : LabelerUtilities.KMedoids1D
         Fitted estimator for heading first derivative
-    speed_clusters : sklearn.cluster.KMeans
+    speed_clusters : LabelerUtilities.KMeans1D
         Fitted estimator for speed
     delta_t_max : float
         the maximum time delta between positions used to define a
@@ -224,16 +275,23 @@ def slice_source_audio_by_cluster(
         the maximum number of clips exported in each segment
     clip_home : pathlib.Path()
         Home directory for clip files
+    do_plot : bool
+        Flag to save a plot of track with identified clips, or not
+    do_plot_empty : bool
+        Flag to save a plot of track for combinations with no clips,
+        or not
 
     Returns
     -------
-    None
+    clips : [dict]
+        File name, start and stop time, and cluster centers of each
+        exported clip
     """
     logger.info(
         f"Slicing source audio by heading, heading first derivative, distance, and speed clusters"
     )
-    # Identify hydrophone attributes
-    hyd_name = Path(hydrophone["name"].lower()).stem
+    # Assign clip file prefix
+    prefix = f"{hyd_name}-"
 
     # Assign cluster centers and ensure heading clusters pair
     distance_centers = distance_clusters.cluster_centers_
@@ -251,153 +309,197 @@ def slice_source_audio_by_cluster(
     speed_centers = speed_clusters.cluster_centers_
     speed_n_clusters = len(speed_centers)
 
-    # Consider each distance cluster center
-    for dis_lbl_idx in range(distance_n_clusters):
+    # Encode distance, heading, heading first derivative, and speed
+    # labels as a single key
+    def encode_key(dis_lbl, hdg_lbl, dot_lbl, spd_lbl):
+        return (
+            (dis_lbl * heading_n_clusters + hdg_lbl) * heading_dot_n_clusters
+            + dot_lbl
+        ) * speed_n_clusters + spd_lbl
+
+    # Sort the keys of all values once, so that the indices of values
+    # sharing a key are contiguous, and in time order
+    key = encode_key(
+        distance_clusters.labels_.astype(np.int64),
+        heading_clusters.labels_,
+        heading_dot_clusters.labels_,
+        speed_clusters.labels_,
+    )
+    order = np.argsort(key, kind="stable")
+    sorted_key = key[order]
+
+    # Consider each positive heading cluster center, and identify the
+    # corresponding negative heading cluster center, that is, 180
+    # degrees from the positive heading cluster center
+    centers = heading_centers.flatten()
+    pos_lbl_idxs = np.flatnonzero(centers > 0)
+    neg_lbl_idxs = np.flatnonzero(centers < 0)
+    neg_hdg_idxs = np.argmin(
+        np.abs(
+            centers[pos_lbl_idxs, np.newaxis] - centers[np.newaxis, neg_lbl_idxs] - 180
+        ),
+        axis=1,
+    )
+    heading_pairs = list(
+        zip(pos_lbl_idxs.tolist(), neg_lbl_idxs[neg_hdg_idxs].tolist())
+    )
 
-        # Identify the distance values corresponding to the distance
-        # cluster center
-        dis_plt_idx = distance_clusters.labels_ == dis_lbl_idx
+    # Enumerate each combination of distance, positive and negative
+    # heading, heading first derivative, and speed cluster centers
+    lbls = np.array(
+        [
+            (dis_lbl_idx, pos_lbl_idx, neg_lbl_idx, dot_lbl_idx, spd_lbl_idx)
+            for dis_lbl_idx, (pos_lbl_idx, neg_lbl_idx), dot_lbl_idx, spd_lbl_idx in (
+                itertools.product(
+                    range(distance_n_clusters),
+                    heading_pairs,
+                    range(heading_dot_n_clusters),
+                    range(speed_n_clusters),
+                )
+            )
+        ],
+        dtype=np.int64,
+    ).reshape(-1, 5)
+
+    # Find the range of sorted indices of values corresponding to the
+    # positive and negative heading of every combination at once
+    pos_key = encode_key(lbls[:, 0], lbls[:, 1], lbls[:, 3], lbls[:, 4])
+    neg_key = encode_key(lbls[:, 0], lbls[:, 2], lbls[:, 3], lbls[:, 4])
+    pos_bounds = np.searchsorted(sorted_key, [pos_key, pos_key + 1]).T
+    neg_bounds = np.searchsorted(sorted_key, [neg_key, neg_key + 1]).T
+
+    # Most combinations have no values, so keep only those that do,
+    # unless plotting empty combinations
+    if not (do_plot and do_plot_empty):
+        has_values = (np.diff(pos_bounds) + np.diff(neg_bounds)).flatten() > 0
+        lbls = lbls[has_values]
+        pos_bounds = pos_bounds[has_values]
+        neg_bounds = neg_bounds[has_values]
+    combos = [
+        (*combo_lbls, order[pos_start:pos_stop], order[neg_start:neg_stop])
+        for combo_lbls, (pos_start, pos_stop), (neg_start, neg_stop) in zip(
+            lbls.tolist(), pos_bounds.tolist(), neg_bounds.tolist()
+        )
+    ]
 
-        # Consider each positive heading cluster center
-        for pos_hdg_idx in range(heading_n_clusters // 2):
+    # Identify valid time sets of all combinations in a single pass
+    clip_bounds, clip_start_t, clip_stop_t = find_clip_ranges(
+        vld_t,
+        [np.sort(np.concatenate((combo[5], combo[6]))) for combo in combos],
+        delta_t_max,
+    )
 
-            # Identify the corresponding negative heading cluster center,
-            # that is, 180 degrees from the positive heading cluster
-            # center
-            neg_hdg_idx = np.argmin(
-                np.abs(
-                    heading_centers[heading_centers > 0][pos_hdg_idx]
-                    - heading_centers[heading_centers < 0]
-                    - 180
-                )
+    # Keep time sets within the times recorded by all hydrophones, and
+    # clip them to those times
+    in_window = np.flatnonzero(
+        (hyd_max_start_t <= clip_stop_t) & (clip_start_t <= hyd_min_stop_t)
+    )
+    clip_bounds = np.searchsorted(in_window, clip_bounds)
+    clip_start_t = np.maximum(clip_start_t[in_window], hyd_max_start_t)
+    clip_stop_t = np.minimum(clip_stop_t[in_window], hyd_min_stop_t)
+
+    # Optionally create a single figure containing the track, to
+    # which the points of each combination are added, then removed
+    if do_plot:
+        # Import matplotlib only when plotting, so runs without plots
+        # never load it
+        from matplotlib.figure import Figure
+
+        fig = Figure()
+        axs = fig.subplots()
+        axs.plot(r_s_h[0, :], r_s_h[1, :])
+        axs.axhline(color="gray", linestyle="dotted")
+        axs.axvline(color="gray", linestyle="dotted")
+        axs.set_xlabel("east [m]")
+        axs.set_ylabel("north [m]")
+
+    # Consider each combination
+    clips = []
+    for combo_idx, (
+        dis_lbl_idx,
+        pos_lbl_idx,
+        neg_lbl_idx,
+        dot_lbl_idx,
+        spd_lbl_idx,
+        pos_idx,
+        neg_idx,
+    ) in enumerate(combos):
+
+        # Skip combinations with no valid time sets, unless plotting
+        # them
+        clip_slice = slice(
+            clip_bounds[combo_idx],
+            min(clip_bounds[combo_idx + 1], clip_bounds[combo_idx] + n_clips_max),
+        )
+        n_clips = clip_slice.stop - clip_slice.start
+        if n_clips == 0 and not (do_plot and do_plot_empty):
+            continue
+
+        # Export the specified number of clips having at least two
+        # valid times
+        label = (
+            f"{distance_centers[dis_lbl_idx][0]:+.1f}"
+            f"{heading_centers[pos_lbl_idx][0]:+.1f}"
+            f"{heading_centers[neg_lbl_idx][0]:+.1f}"
+            f"{heading_dot_centers[dot_lbl_idx][0]:+.1f}"
+            f"{speed_centers[spd_lbl_idx][0]:+.1f}"
+        )
+        for start_t, stop_t in zip(
+            clip_start_t[clip_slice].tolist(), clip_stop_t[clip_slice].tolist()
+        ):
+            clip_filename = f"{prefix}{start_t:d}-{stop_t:d}{label}.wav"
+            lu.export_audio_file_clip(
+                wav_path, wav_header, start_t, stop_t, clip_home / clip_filename
+            )
+            clips.append(
+                {
+                    "filename": clip_filename,
+                    "start_t": start_t,
+                    "stop_t": stop_t,
+                    "distance": distance_centers[dis_lbl_idx][0],
+                    "heading_pos": heading_centers[pos_lbl_idx][0],
+                    "heading_neg": heading_centers[neg_lbl_idx][0],
+                    "heading_dot": heading_dot_centers[dot_lbl_idx][0],
+                    "speed": speed_centers[spd_lbl_idx][0],
+                }
             )
 
-            # Identify the heading values corresponding to the positive
-            # and negative heading cluster centers
-            pos_lbl_idx = np.argwhere(
-                heading_centers == heading_centers[heading_centers > 0][pos_hdg_idx]
-            )[0, 0]
-            neg_lbl_idx = np.argwhere(
-                heading_centers == heading_centers[heading_centers < 0][neg_hdg_idx]
-            )[0, 0]
-            pos_plt_idx = heading_clusters.labels_ == pos_lbl_idx
-            neg_plt_idx = heading_clusters.labels_ == neg_lbl_idx
-
-            # Consider each heading first derivative cluster center
-            for dot_lbl_idx in range(heading_dot_n_clusters):
-
-                # Identify the heading first derivative values corresponding to
-                # the heading first derivative cluster center
-                dot_plt_idx = heading_dot_clusters.labels_ == dot_lbl_idx
-
-                # Consider each speed cluster center
-                for spd_lbl_idx in range(speed_n_clusters):
-
-                    # Identify the speed values corresponding to the
-                    # speed cluster center
-                    spd_plt_idx = speed_clusters.labels_ == spd_lbl_idx
-
-                    # Identify valid time sets in which successive
-                    # times and no more than the specified delta time
-                    dub_t = vld_t[
-                        (pos_plt_idx | neg_plt_idx)
-                        & dot_plt_idx
-                        & spd_plt_idx
-                        & dis_plt_idx
-                    ]
-                    dub_t_sets = np.split(
-                        dub_t, np.where(np.diff(dub_t) > delta_t_max)[0] + 1
-                    )
+        # Optionally plot the track and color points corresponding to
+        # the current heading, heading first derivative, distance, and
+        # speed cluster centers, if any clips were exported
+        if do_plot and (n_clips > 0 or do_plot_empty):
+            (pos_line,) = axs.plot(
+                r_s_h[0, pos_idx], r_s_h[1, pos_idx], ".", color="C1"
+            )
+            (neg_line,) = axs.plot(
+                r_s_h[0, neg_idx], r_s_h[1, neg_idx], ".", color="C2"
+            )
+            title = "{:s}\n"
+            title += "dis = {:.1f} m"
+            title += ", hdgs = {:.1f}, {:.1f} deg"
+            title += ", hdg dot = {:.1f} deg/s"
+            title += ", spd = {:.1f} m/s"
+            axs.set_title(
+                title.format(
+                    hyd_name,
+                    distance_centers[dis_lbl_idx][0],
+                    heading_centers[pos_lbl_idx][0],
+                    heading_centers[neg_lbl_idx][0],
+                    heading_dot_centers[dot_lbl_idx][0],
+                    speed_centers[spd_lbl_idx][0],
+                )
+            )
+            fig.savefig(clip_home / f"{prefix}track{label}.png", dpi=80)
+            pos_line.remove()
+            neg_line.remove()
 
-                    # Export the specified number of clips having at
-                    # least two valid times
-                    n_clips = 0
-                    for dub_t_set in dub_t_sets:
-                        if dub_t_set.shape[0] > 2:
-                            dub_start_t = int(dub_t_set[0] * 1000)
-                            dub_stop_t = int(dub_t_set[-1] * 1000)
-                            if (
-                                dub_stop_t < hyd_max_start_t
-                                or hyd_min_stop_t < dub_start_t
-                            ):
-                                continue
-                            start_t = max(hyd_max_start_t, dub_start_t)
-                            stop_t = min(hyd_min_stop_t, dub_stop_t)
-                            n_clips += 1
-                            wav_filename = (
-                                "{:s}-{:d}-{:d}{:+.1f}{:+.1f}{:+.1f}{:+.1f}{:+.1f}.wav"
-                            )
-                            lu.export_audio_clip(
-                                audio,
-                                start_t,
-                                stop_t,
-                                clip_home
-                                / wav_filename.format(
-                                    hyd_name,
-                                    start_t,
-                                    stop_t,
-                                    distance_centers[dis_lbl_idx][0],
-                                    heading_centers[pos_lbl_idx][0],
-                                    heading_centers[neg_lbl_idx][0],
-                                    heading_dot_centers[dot_lbl_idx][0],
-                                    speed_centers[spd_lbl_idx][0],
-                                ),
-                            )
-                            if n_clips > n_clips_max:
-                                break
-
-                    # Optionally plot the track and color points
-                    # corresponding to the current heading, heading
-                    # first derivative, distance, and speed cluster
-                    # centers
-                    if do_plot:
-                        fig, axs = plt.subplots()
-                        axs.plot(r_s_h[0, :], r_s_h[1, :])
-                        axs.plot(
-                            r_s_h[
-                                0, dis_plt_idx & pos_plt_idx & dot_plt_idx & spd_plt_idx
-                            ],
-                            r_s_h[
-                                1, dis_plt_idx & pos_plt_idx & dot_plt_idx & spd_plt_idx
-                            ],
-                            ".",
-                        )
-                        axs.plot(
-                            r_s_h[
-                                0, dis_plt_idx & neg_plt_idx & dot_plt_idx & spd_plt_idx
-                            ],
-                            r_s_h[
-                                1, dis_plt_idx & neg_plt_idx & dot_plt_idx & spd_plt_idx
-                            ],
-                            ".",
-                        )
-                        axs.axhline(color="gray", linestyle="dotted")
-                        axs.axvline(color="gray", linestyle="dotted")
-                        title = "{:s}\n"
-                        title += "dis = {:.1f} m"
-                        title += ", hdgs = {:.1f}, {:.1f} deg"
-                        title += ", hdg dot = {:.1f} deg/s"
-                        title += ", spd = {:.1f} m/s"
-                        axs.set_title(
-                            title.format(
-                                hyd_name,
-                                distance_centers[dis_lbl_idx][0],
-                                heading_centers[pos_lbl_idx][0],
-                                heading_centers[neg_lbl_idx][0],
-                                heading_dot_centers[dot_lbl_idx][0],
-                                speed_centers[spd_lbl_idx][0],
-                            )
-                        )
-                        axs.set_xlabel("east [m]")
-                        axs.set_ylabel("north [m]")
-                        plt.show()
-                        sleep_time = 1
-                        time.sleep(sleep_time)
+    return clips
 
 
 def slice_source_audio_by_condition(
-    hydrophone,
-    audio,
+    hyd_name,
+    wav_path,
+    wav_header,
     hyd_max_start_t,
     hyd_min_stop_t,
     vld_t,
@@ -416,16 +518,19 @@ def slice_source_audio_by_condition(
     do_plot=True,
 ):
     """Slice source audio by heading, heading first derivative,
-    distance, and speed limits. Optionally plot source track and
-    label the intersection of the heading, heading first derivative,
+    distance, and speed limits. Optionally save a plot of the source
+    track labeling the intersection of the heading, heading first derivative,
     distance, and speed clusters.
 
     Parameters
     ----------
-    hydrophone : dict
-        The hydrophone configuration
-    audio : pydub.audio_segment.AudioSegment
-        The audio segment
+    hyd_name : str
+        The hydrophone name used to prefix clip files
+    wav_path : pathlib.Path()
+        Path of the hydrophone audio file
+    wav_header : dict or None
+        The WAV file header returned by LabelerUtilities.get_wav_header(),
+        or None for audio files of other types
     hyd_max_start_t : int
        Maximum start_t of all hydrophones [ms]
     hyd_min_stop_t : int
@@ -460,13 +565,15 @@ def slice_source_audio_by_condition(
 
     Returns
     -------
-    None
+    clips : [dict]
+        File name, start and stop time, and limits of each exported
+        clip
     """
     logger.info(
         f"Slicing source audio by heading, heading first derivative, distance, and speed limits"
     )
-    # Identify hydrophone attributes
-    hyd_name = Path(hydrophone["name"].lower()).stem
+    # Assign clip file prefix
+    prefix = f"{hyd_name}-"
 
     # Identify the distance values corresponding to the distance
     # limits
@@ -489,59 +596,61 @@ def slice_source_audio_by_condition(
     # Identify the speed values corresponding to the speed limits
     spd_plt_idx = np.logical_and(speed_limits[0] < speed, speed < speed_limits[1])
 
+    # Identify the values corresponding to all limits once, for both
+    # slicing and plotting, accumulating into a single mask
+    plt_idx = np.logical_and(dis_plt_idx, hdg_plt_idx)
+    np.logical_and(plt_idx, dot_plt_idx, out=plt_idx)
+    np.logical_and(plt_idx, spd_plt_idx, out=plt_idx)
+
     # Identify valid time sets in which successive times and no more
     # than the specified delta time
-    dub_t = vld_t[dis_plt_idx & hdg_plt_idx & dot_plt_idx & spd_plt_idx]
-    dub_t_sets = np.split(dub_t, np.where(np.diff(dub_t) > delta_t_max)[0] + 1)
+    _, clip_start_t, clip_stop_t = find_clip_ranges(
+        vld_t, [np.flatnonzero(plt_idx)], delta_t_max
+    )
+
+    # Keep time sets within the times recorded by all hydrophones, and
+    # clip them to those times
+    in_window = np.flatnonzero(
+        (hyd_max_start_t <= clip_stop_t) & (clip_start_t <= hyd_min_stop_t)
+    )[:n_clips_max]
+    clip_start_t = np.maximum(clip_start_t[in_window], hyd_max_start_t)
+    clip_stop_t = np.minimum(clip_stop_t[in_window], hyd_min_stop_t)
 
     # Export the specified number of clips having at least two valid
     # times
-    n_clips = 0
-    for dub_t_set in dub_t_sets:
-        if dub_t_set.shape[0] > 2:
-            dub_start_t = int(dub_t_set[0] * 1000)
-            dub_stop_t = int(dub_t_set[-1] * 1000)
-            if dub_stop_t < hyd_max_start_t or hyd_min_stop_t < dub_start_t:
-                continue
-            start_t = max(hyd_max_start_t, dub_start_t)
-            stop_t = min(hyd_min_stop_t, dub_stop_t)
-            n_clips += 1
-            wav_filename = "{:s}-{:d}-{:d}-{:+.1f}to{:+.1f}-{:+.1f}to{:+.1f}-and-{:+.1f}to{:+.1f}-{:+.1f}to{:+.1f}-{:+.1f}to{:+.1f}.wav"
-            lu.export_audio_clip(
-                audio,
-                start_t,
-                stop_t,
-                clip_home
-                / wav_filename.format(
-                    hyd_name,
-                    start_t,
-                    stop_t,
-                    distance_limits[0],
-                    distance_limits[1],
-                    heading_limits[0],
-                    heading_limits[1],
-                    heading_limits[2],
-                    heading_limits[3],
-                    heading_dot_limits[0],
-                    heading_dot_limits[1],
-                    speed_limits[0],
-                    speed_limits[1],
-                ),
-            )
-            if n_clips > n_clips_max:
-                break
+    label = (
+        f"-{distance_limits[0]:+.1f}to{distance_limits[1]:+.1f}"
+        f"-{heading_limits[0]:+.1f}to{heading_limits[1]:+.1f}"
+        f"-and-{heading_limits[2]:+.1f}to{heading_limits[3]:+.1f}"
+        f"-{heading_dot_limits[0]:+.1f}to{heading_dot_limits[1]:+.1f}"
+        f"-{speed_limits[0]:+.1f}to{speed_limits[1]:+.1f}"
+    )
+    limits = {
+        "distance_limits": distance_limits,
+        "heading_limits": heading_limits,
+        "heading_dot_limits": heading_dot_limits,
+        "speed_limits": speed_limits,
+    }
+    clips = []
+    for start_t, stop_t in zip(clip_start_t.tolist(), clip_stop_t.tolist()):
+        clip_filename = f"{prefix}{start_t:d}-{stop_t:d}{label}.wav"
+        lu.export_audio_file_clip(
+            wav_path, wav_header, start_t, stop_t, clip_home / clip_filename
+        )
+        clips.append(
+            {"filename": clip_filename, "start_t": start_t, "stop_t": stop_t, **limits}
+        )
 
     # Optionally plot the track and color points corresponding to the
     # current heading, heading first derivative, distance, and speed
     # cluster centers
     if do_plot:
-        fig, axs = plt.subplots()
+        from matplotlib.figure import Figure
+
+        fig = Figure()
+        axs = fig.subplots()
         axs.plot(r_s_h[0, :], r_s_h[1, :])
-        axs.plot(
-            r_s_h[0, dis_plt_idx & hdg_plt_idx & dot_plt_idx & spd_plt_idx],
-            r_s_h[1, dis_plt_idx & hdg_plt_idx & dot_plt_idx & spd_plt_idx],
-            ".",
-        )
+        axs.plot(r_s_h[0, plt_idx], r_s_h[1, plt_idx], ".")
         axs.axhline(color="gray", linestyle="dotted")
         axs.axvline(color="gray", linestyle="dotted")
         title = "{:s}\n"
@@ -566,9 +675,163 @@ def slice_source_audio_by_condition(
         )
         axs.set_xlabel("east [m]")
         axs.set_ylabel("north [m]")
-        plt.show()
-        sleep_time = 1
-        time.sleep(sleep_time)
+        fig.savefig(clip_home / f"{prefix}track{label}.png", dpi=80)
+
+    return clips
+
+
+def process_hydrophone(
+    src_name,
+    hyd_name,
+    wav_path,
+    src_max_stop_t,
+    hyd_max_start_t,
+    hyd_min_stop_t,
+    vld_t,
+    distance,
+    heading,
+    heading_dot,
+    speed,
+    r_s_h,
+    sampling,
+    clip_home,
+    do_plot=False,
+    do_plot_empty=False,
+):
+    """Export audio with no source present, and slice source audio for
+    each sampling case, for a single hydrophone. Each call is
+    independent, so hydrophones can be processed concurrently.
+
+    Parameters
+    ----------
+    src_name : str
+        The source name used to prefix clip manifest files
+    hyd_name : str
+        The hydrophone name used to prefix clip files
+    wav_path : pathlib.Path()
+        Path of the hydrophone audio file
+    src_max_stop_t : int
+       Maximum stop_t of all sources [ms]
+    hyd_max_start_t : int
+       Maximum start_t of all hydrophones [ms]
+    hyd_min_stop_t : int
+       Minimum stop_t of all hydrophones [ms]
+    vld_t : numpy.ndarray
+        Time from start of track [s]
+    distance : numpy.ndarray
+        Source distance from hydrophone [m]
+    heading : numpy.ndarray
+        Source heading, zero at north, clockwise positive
+    heading_dot : numpy.ndarray
+        Source heading first derivative
+    speed : numpy.ndarray
+        Source speed [m/s]
+    r_s_h : numpy.ndarray
+        Source topocentric (east, north, zenith) position [m]
+    sampling : list
+        The sampling cases
+    clip_home : pathlib.Path()
+        Home directory for clip files
+    do_plot : bool
+        Flag to save a plot of track with identified clips, or not
+    do_plot_empty : bool
+        Flag to save a plot of track for cluster combinations with no
+        clips, or not
+
+    Returns
+    -------
+    None
+    """
+    # Parse the WAV header once, so clips can be exported by copying
+    # frames rather than decoding the whole file, and decode only each
+    # clip of audio files of other types
+    wav_header = None
+    if wav_path.suffix.lower() == ".wav":
+        wav_header = lu.get_wav_header(wav_path)
+
+    # Export audio with no source present, if it exists
+    if src_max_stop_t < hyd_min_stop_t:
+        if not (clip_home / "no-boat").exists():
+            os.makedirs(clip_home / "no-boat", exist_ok=True)
+        lu.export_audio_file_clip(
+            wav_path,
+            wav_header,
+            src_max_stop_t,
+            hyd_min_stop_t,
+            clip_home
+            / "no-boat"
+            / f"{hyd_name}-{src_max_stop_t}-{hyd_min_stop_t}-no-source.wav",
+        )
+
+    # Consider each sampling case
+    for case in sampling:
+        case_home = clip_home / case["output_dir"]
+        if not case_home.exists():
+            case_home.mkdir(parents=True, exist_ok=True)
+        method = case["method"]
+        clips = []
+        if method["type"] == "clusters":
+            (
+                distance_clusters,
+                heading_clusters,
+                heading_dot_clusters,
+                speed_clusters,
+            ) = lu.cluster_source_metrics(
+                distance,
+                method["distance_n_clusters"],
+                heading,
+                method["heading_n_clusters"],
+                heading_dot,
+                method["heading_dot_n_clusters"],
+                speed,
+                method["speed_n_clusters"],
+            )
+            clips = slice_source_audio_by_cluster(
+                hyd_name,
+                wav_path,
+                wav_header,
+                hyd_max_start_t,
+                hyd_min_stop_t,
+                vld_t,
+                r_s_h,
+                distance_clusters,
+                heading_clusters,
+                heading_dot_clusters,
+                speed_clusters,
+                case["delta_t_max"],
+                case["n_clips_max"],
+                case_home,
+                do_plot=do_plot,
+                do_plot_empty=do_plot_empty,
+            )
+        elif method["type"] == "conditionals":
+            clips = slice_source_audio_by_condition(
+                hyd_name,
+                wav_path,
+                wav_header,
+                hyd_max_start_t,
+                hyd_min_stop_t,
+                vld_t,
+                r_s_h,
+                distance,
+                method["distance_limits"],
+                heading,
+                method["heading_limits"],
+                heading_dot,
+                method["heading_dot_limits"],
+                speed,
+                method["speed_limits"],
+                case["delta_t_max"],
+                case["n_clips_max"],
+                case_home,
+                do_plot=do_plot,
+            )
+
+        # Write a manifest of the exported clips once for the source,
+        # hydrophone, and case
+        pd.DataFrame(clips).to_csv(
+            case_home / f"{src_name}-{hyd_name}-clips.csv", index=False
+        )
 
 
 def main():
@@ -596,7 +859,12 @@ def main():
         "-p",
         "--do-plot-clips",
         action="store_true",
-        help="do plot track with identified clips",
+        help="do save plots of track with identified clips",
+    )
+    parser.add_argument(
+        "--plot-empty",
+        action="store_true",
+        help="do save plots of track for cluster combinations with no clips, with -p",
     )
     parser.add_argument(
         "-P",
@@ -610,7 +878,21 @@ def main():
         default=str(Path("~").expanduser() / "Datasets" / "AISonobuoy"),
         help="the directory containing clip WAV files",
     )
+    parser.add_argument(
+        "--dump-pretty-gpx",
+        action="store_true",
+        help="do write a pretty printed copy of each GPX file",
+    )
+    parser.add_argument(
+        "-n",
+        "--n-workers",
+        type=int,
+        default=os.cpu_count(),
+        help="the number of processes used to process hydrophones",
+    )
     args = parser.parse_args()
+    if args.n_workers < 1:
+        parser.error("argument -n/--n-workers: must be at least 1")
 
     # Load file describing the collection
     collection_path = Path(args.data_home) / args.collection_filename
@@ -637,104 +919,71 @@ def main():
             raise Exception("Unexpected source type")
         gpx_path = Path(args.data_home) / source["name"]
         gpx, vld_t, vld_lambda, vld_varphi, vld_h = parse_source_gpx_file(
-            gpx_path, source
+            gpx_path, source, dump_pretty=args.dump_pretty_gpx
         )
 
-        # Consider each hydrophone
+        # Compute and plot source metrics once for each hydrophone
+        # position, then consider each hydrophone
+        metrics = {}
+        tasks = []
         for hydrophone in collection["hydrophones"]:
             if hydrophone["type"] != "file":
                 raise Exception("Unexpected hydrophone type")
-            wav_path = Path(args.data_home) / hydrophone["name"]
-            audio = lu.get_audio_file(wav_path)
-
-            # Export audio with no source present, if it exists
-            if src_max_stop_t < hyd_min_stop_t:
-                if not (Path(args.clip_home) / "no-boat").exists():
-                    os.makedirs(Path(args.clip_home) / "no-boat", exist_ok=True)
-                lu.export_audio_clip(
-                    audio,
+            position = (hydrophone["lat"], hydrophone["lon"], hydrophone["ele"])
+            if position not in metrics:
+                metrics[position] = lu.compute_source_metrics(
+                    source, vld_t, vld_lambda, vld_varphi, vld_h, hydrophone
+                )
+                if args.do_plot_metrics:
+                    distance, heading, heading_dot, speed, r_s_h, _ = metrics[
+                        position
+                    ]
+                    lu.plot_source_metrics(
+                        source, hydrophone, heading, heading_dot, distance, speed, r_s_h
+                    )
+            distance, heading, heading_dot, speed, r_s_h, _ = metrics[position]
+            tasks.append(
+                (
+                    Path(source["name"]).stem.lower(),
+                    Path(hydrophone["name"]).stem.lower(),
+                    Path(args.data_home) / hydrophone["name"],
                     src_max_stop_t,
+                    hyd_max_start_t,
                     hyd_min_stop_t,
-                    Path(args.clip_home)
-                    / "no-boat"
-                    / f"{Path(hydrophone['name'].lower()).stem}-{src_max_stop_t}-{hyd_min_stop_t}-no-source.wav",
+                    vld_t,
+                    distance,
+                    heading,
+                    heading_dot,
+                    speed,
+                    r_s_h,
+                    sampling,
+                    Path(args.clip_home),
                 )
-
-            # Compute and plot source metrics for the current hydrophone
-            (
-                distance,
-                heading,
-                heading_dot,
-                speed,
-                r_s_h,
-                v_s_h,
-            ) = lu.compute_source_metrics(
-                source, vld_t, vld_lambda, vld_varphi, vld_h, hydrophone
             )
-            if args.do_plot_metrics:
-                lu.plot_source_metrics(
-                    source, hydrophone, heading, heading_dot, distance, speed, r_s_h
-                )
 
-            # Consider each sampling case
-            for case in sampling:
-                clip_home = Path(args.clip_home) / case["output_dir"]
-                if not clip_home.exists():
-                    clip_home.mkdir(parents=True)
-                method = case["method"]
-                if method["type"] == "clusters":
-                    (
-                        distance_clusters,
-                        heading_clusters,
-                        heading_dot_clusters,
-                        speed_clusters,
-                    ) = lu.cluster_source_metrics(
-                        distance,
-                        method["distance_n_clusters"],
-                        heading,
-                        method["heading_n_clusters"],
-                        heading_dot,
-                        method["heading_dot_n_clusters"],
-                        speed,
-                        method["speed_n_clusters"],
-                    )
-                    slice_source_audio_by_cluster(
-                        hydrophone,
-                        audio,
-                        hyd_max_start_t,
-                        hyd_min_stop_t,
-                        vld_t,
-                        r_s_h,
-                        distance_clusters,
-                        heading_clusters,
-                        heading_dot_clusters,
-                        speed_clusters,
-                        case["delta_t_max"],
-                        case["n_clips_max"],
-                        clip_home,
-                        do_plot=args.do_plot_clips,
-                    )
-                elif method["type"] == "conditionals":
-                    slice_source_audio_by_condition(
-                        hydrophone,
-                        audio,
-                        hyd_max_start_t,
-                        hyd_min_stop_t,
-                        vld_t,
-                        r_s_h,
-                        distance,
-                        method["distance_limits"],
-                        heading,
-                        method["heading_limits"],
-                        heading_dot,
-                        method["heading_dot_limits"],
-                        speed,
-                        method["speed_limits"],
-                        case["delta_t_max"],
-                        case["n_clips_max"],
-                        clip_home,
+        # Process each hydrophone, concurrently if more than one
+        # worker, using no more workers than hydrophones
+        n_workers = min(args.n_workers, len(tasks))
+        if n_workers <= 1:
+            for task in tasks:
+                process_hydrophone(
+                    *task,
+                    do_plot=args.do_plot_clips,
+                    do_plot_empty=args.plot_empty,
+                )
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                futures = [
+                    executor.submit(
+                        process_hydrophone,
+                        *task,
                         do_plot=args.do_plot_clips,
+                        do_plot_empty=args.plot_empty,
                     )
+                    for task in tasks
+                ]
+                for future in futures:
+                    future.result()
 
 
 if __name__ == "__main__":
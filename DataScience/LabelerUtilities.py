@@ -1,15 +1,15 @@
+import functools
 import json
 import logging
 import math
+import os
 from pathlib import Path
+import struct
 import subprocess
 
-from matplotlib import pyplot as plt
 import numpy as np
-import pandas as pd
 from pydub import AudioSegment
-from sklearn.cluster import KMeans
-from sklearn_extra.cluster import KMedoids
+from scipy.signal import lfilter
 
 import LabelerUtilities as lu
 
@@ -17,6 +17,12 @@ import LabelerUtilities as lu
 R_OPLUS = 6378137  # [m]
 F_INV = 298.257223563
 
+# Audio segment readers by file extension
+AUDIO_FILE_READERS = {
+    ".wav": AudioSegment.from_wav,
+    ".flac": functools.partial(AudioSegment.from_file, format="flac"),
+}
+
 root_logger = logging.getLogger()
 if not root_logger.handlers:
     ch = logging.StreamHandler()
@@ -67,15 +73,73 @@ def get_audio_file(inp_path):
     https://github.com/jiaaro/pydub
     """
     logger.info(f"Getting {inp_path}")
-    if inp_path.suffix.lower() == ".wav":
-        audio = AudioSegment.from_wav(inp_path)
+    read_audio_file = AUDIO_FILE_READERS.get(inp_path.suffix.lower())
+    if read_audio_file is None:
+        raise Exception(f"Unsupported audio file type {inp_path.suffix}")
+    audio = read_audio_file(inp_path)
+    return audio
+
+
+def get_audio_clip(inp_path, start_t, stop_t):
+    """Get audio segment of a clip from an audio file, decoding only
+    the clip.
+
+    Parameters
+    ----------
+    inp_path : pathlib.Path()
+        Path of the audio file to open
+    start_t : int
+        Start time of clip to get [ms]
+    stop_t : int
+        Stop time of clip to get [ms]
 
-    elif inp_path.suffix.lower() == ".flac":
-        audio = AudioSegment.from_file(inp_path, "flac")
+    Returns
+    -------
+    audio : pydub.audio_segment.AudioSegment
+        The audio segment of the clip
 
+    See also:
+    https://github.com/jiaaro/pydub
+    """
+    logger.info(f"Getting {inp_path} from {start_t} to {stop_t} [ms]")
+    audio = AudioSegment.from_file(
+        inp_path,
+        inp_path.suffix.lower()[1:],
+        start_second=start_t / 1000,
+        duration=(stop_t - start_t) / 1000,
+    )
     return audio
 
 
+def export_audio_file_clip(inp_path, wav_header, start_t, stop_t, clip_filepath):
+    """Export a clip from an audio file, by copying frames if a WAV
+    file header is given, or by decoding only the clip otherwise.
+
+    Parameters
+    ----------
+    inp_path : pathlib.Path()
+        Path of the audio file
+    wav_header : dict or None
+        The WAV file header returned by get_wav_header(), or None for
+        audio files of other types
+    start_t : int
+        Start time of clip to export [ms]
+    stop_t : int
+        Stop time of clip to export [ms]
+    clip_filepath : pathlib.Path()
+        Path of the clip file to export
+
+    Returns
+    -------
+    None
+    """
+    if wav_header is not None:
+        export_audio_clip_fast(inp_path, wav_header, start_t, stop_t, clip_filepath)
+    else:
+        audio = get_audio_clip(inp_path, start_t, stop_t)
+        export_audio_clip(audio, 0, stop_t - start_t, clip_filepath)
+
+
 def probe_audio_file(input_path):
     """Probe audio file to obtain stream entry values.
 
@@ -133,6 +197,155 @@ def export_audio_clip(audio, start_t, stop_t, clip_filepath):
     clip.export(clip_filepath, format="wav")
 
 
+def get_wav_header(inp_path):
+    """Get the format chunk, and the offset and size of the data
+    chunk, of a WAV file, so that clips can be exported without
+    decoding the file.
+
+    Parameters
+    ----------
+    inp_path : pathlib.Path()
+        Path of the WAV file to parse
+
+    Returns
+    -------
+    wav_header : dict
+        The format chunk, frame rate, frame width, and data chunk
+        offset and size [bytes]
+
+    See also:
+    http://soundfile.sapp.org/doc/WaveFormat/
+    """
+    logger.info(f"Getting header of {inp_path}")
+    with open(inp_path, "rb") as f:
+        riff_id, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+        if riff_id != b"RIFF" or wave_id != b"WAVE":
+            raise Exception(f"{inp_path} is not a RIFF WAVE file")
+        fmt_chunk = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                raise Exception(f"{inp_path} has no data chunk")
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+            if chunk_id == b"data":
+                data_offset = f.tell()
+                break
+            if chunk_id == b"fmt ":
+                fmt_chunk = f.read(chunk_size)
+                f.seek(chunk_size % 2, os.SEEK_CUR)
+            else:
+                # Chunks are padded to an even size
+                f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+    if fmt_chunk is None:
+        raise Exception(f"{inp_path} has no format chunk")
+    _, _, frame_rate, _, frame_width = struct.unpack("<HHIIH", fmt_chunk[:14])
+
+    # Recorders which are stopped abruptly can leave an invalid data
+    # chunk size, so limit the size to the bytes present
+    data_size = min(chunk_size, os.path.getsize(inp_path) - data_offset)
+    data_size -= data_size % frame_width
+    return {
+        "fmt_chunk": fmt_chunk,
+        "frame_rate": frame_rate,
+        "frame_width": frame_width,
+        "data_offset": data_offset,
+        "data_size": data_size,
+    }
+
+
+def export_audio_clip_fast(inp_path, wav_header, start_t, stop_t, clip_filepath):
+    """Export a clip from a WAV file, or from the concatenation of WAV
+    files, by copying the corresponding frames, without decoding or
+    encoding audio. The clip spans the frames of slicing the
+    corresponding audio segment, but keeps the sample format of the
+    WAV file, which pydub can change, for example writing 24-bit
+    samples as 32-bit.
+
+    Parameters
+    ----------
+    inp_path : pathlib.Path() or [pathlib.Path()]
+        Path of the WAV file, or paths of the WAV files to concatenate
+    wav_header : dict or [dict]
+        The WAV file header, or headers, returned by get_wav_header()
+    start_t : int
+        Start time of clip to export [ms]
+    stop_t : int
+        Stop time of clip to export [ms]
+    clip_filepath : pathlib.Path()
+        Path of the clip file to export
+
+    Returns
+    -------
+    None
+    """
+    if isinstance(inp_path, (list, tuple)):
+        inp_paths, wav_headers = inp_path, wav_header
+    else:
+        inp_paths, wav_headers = [inp_path], [wav_header]
+    fmt_chunk = wav_headers[0]["fmt_chunk"]
+    if any(header_f["fmt_chunk"] != fmt_chunk for header_f in wav_headers):
+        raise Exception("WAV files to concatenate must have the same format")
+
+    # Convert times to frames as pydub does, limiting times to the
+    # duration of the audio
+    frame_rate = wav_headers[0]["frame_rate"]
+    frame_width = wav_headers[0]["frame_width"]
+    n_frames = [header_f["data_size"] // frame_width for header_f in wav_headers]
+    duration = round(1000 * sum(n_frames) / frame_rate)
+    start_frame = int(min(start_t, duration) * (frame_rate / 1000.0))
+    stop_frame = int(min(stop_t, duration) * (frame_rate / 1000.0))
+    stop_frame = max(start_frame, stop_frame)
+
+    # Identify the offset and size of the frames to copy from each file
+    segments = []
+    count = 0
+    for path_f, header_f, n_frames_f in zip(inp_paths, wav_headers, n_frames):
+        start_frame_f = min(start_frame, n_frames_f)
+        stop_frame_f = min(stop_frame, n_frames_f)
+        if start_frame_f < stop_frame_f:
+            offset_f = header_f["data_offset"] + start_frame_f * frame_width
+            count_f = (stop_frame_f - start_frame_f) * frame_width
+            segments.append((path_f, offset_f, count_f))
+            count += count_f
+        start_frame = max(start_frame - n_frames_f, 0)
+        stop_frame = max(stop_frame - n_frames_f, 0)
+
+    # Write the header, reusing the format chunk of the WAV file, and
+    # noting chunks are padded to an even size
+    fmt_size = len(fmt_chunk)
+    if fmt_size % 2:
+        fmt_chunk += b"\x00"
+    pad = b"\x00" * (count % 2)
+    header = b"".join(
+        [
+            struct.pack(
+                "<4sI4s", b"RIFF", 20 + len(fmt_chunk) + count + len(pad), b"WAVE"
+            ),
+            struct.pack("<4sI", b"fmt ", fmt_size),
+            fmt_chunk,
+            struct.pack("<4sI", b"data", count),
+        ]
+    )
+    with open(clip_filepath, "wb", buffering=0) as out_f:
+        out_f.write(header)
+        for path_f, offset_f, count_f in segments:
+            with open(path_f, "rb") as inp_f:
+                # Copy the frames in the kernel, if possible
+                try:
+                    while count_f > 0:
+                        n_sent = os.sendfile(
+                            out_f.fileno(), inp_f.fileno(), offset_f, count_f
+                        )
+                        if n_sent == 0:
+                            break
+                        offset_f += n_sent
+                        count_f -= n_sent
+                except (AttributeError, OSError):
+                    inp_f.seek(offset_f)
+                    out_f.write(inp_f.read(count_f))
+        out_f.write(pad)
+
+
 def compute_E(_lambda, _varphi):
     """Compute geocentric east, north, and zenith unit vectors at a
     given geodetic longitude and latitude, and the corresponding
@@ -152,22 +365,17 @@ def compute_E(_lambda, _varphi):
         Orthogonal transformation matrix from geocentric to
         topocentric coordinates
     """
-    e_E = np.array([-math.sin(_lambda), math.cos(_lambda), 0])
-    e_N = np.array(
-        [
-            -math.sin(_varphi) * math.cos(_lambda),
-            -math.sin(_varphi) * math.sin(_lambda),
-            math.cos(_varphi),
-        ]
-    )
-    e_Z = np.array(
+    sin_lambda = math.sin(_lambda)
+    cos_lambda = math.cos(_lambda)
+    sin_varphi = math.sin(_varphi)
+    cos_varphi = math.cos(_varphi)
+    E = np.array(
         [
-            math.cos(_varphi) * math.cos(_lambda),
-            math.cos(_varphi) * math.sin(_lambda),
-            math.sin(_varphi),
+            [-sin_lambda, cos_lambda, 0],  # e_E
+            [-sin_varphi * cos_lambda, -sin_varphi * sin_lambda, cos_varphi],  # e_N
+            [cos_varphi * cos_lambda, cos_varphi * sin_lambda, sin_varphi],  # e_Z
         ]
     )
-    E = np.row_stack((e_E, e_N, e_Z))
     return E
 
 
@@ -187,31 +395,153 @@ def compute_R(_lambda, _varphi, _h):
     Returns
     -------
     R : numpy.ndarray
-        Geocentric position [m]
+        Geocentric position, of shape (3,) or (3, N) [m]
 
     """
+    # Evaluate each trigonometric function once, and fill the rows of
+    # a single array in place, for scalars and arrays alike
     f = 1 / F_INV
-    if type(_lambda) == float:
-        N = R_OPLUS / math.sqrt(1 - f * (2 - f) * math.sin(_varphi) ** 2)
-        R = np.array(
-            [
-                (N + _h) * math.cos(_varphi) * math.cos(_lambda),
-                (N + _h) * math.cos(_varphi) * math.sin(_lambda),
-                ((1 - f) ** 2 * N + _h) * math.sin(_varphi),
-            ]
-        )
-    elif type(_lambda) == np.ndarray:
-        N = R_OPLUS / np.sqrt(1 - f * (2 - f) * np.sin(_varphi) ** 2)
-        R = np.row_stack(
-            (
-                (N + _h) * np.cos(_varphi) * np.cos(_lambda),
-                (N + _h) * np.cos(_varphi) * np.sin(_lambda),
-                ((1 - f) ** 2 * N + _h) * np.sin(_varphi),
-            ),
-        )
+    sin_varphi = np.sin(_varphi)
+    N = R_OPLUS / np.sqrt(1 - f * (2 - f) * sin_varphi**2)
+    N_h_cos_varphi = (N + _h) * np.cos(_varphi)
+    R = np.empty((3,) + np.shape(N))
+    np.multiply(N_h_cos_varphi, np.cos(_lambda), out=R[0, ...])
+    np.multiply(N_h_cos_varphi, np.sin(_lambda), out=R[1, ...])
+    np.multiply((1 - f) ** 2 * N + _h, sin_varphi, out=R[2, ...])
     return R
 
 
+@functools.lru_cache(maxsize=32)
+def compute_hydrophone_frame(hyd_lon, hyd_lat, hyd_ele):
+    """Compute the orthogonal transformation matrix from geocentric to
+    topocentric coordinates, and the geocentric position, of a
+    hydrophone. Results are cached, since each hydrophone is
+    considered for every source.
+
+    Parameters
+    ----------
+    hyd_lon : float
+        Hydrophone geodetic longitude [deg]
+    hyd_lat : float
+        Hydrophone geodetic latitude [deg]
+    hyd_ele : float
+        Hydrophone elevation [m]
+
+    Returns
+    -------
+    E : numpy.ndarray
+        Orthogonal transformation matrix from geocentric to
+        topocentric coordinates, read only
+    R_h : numpy.ndarray
+        Hydrophone geocentric position [m], read only
+    """
+    hyd_lambda = math.radians(hyd_lon)
+    hyd_varphi = math.radians(hyd_lat)
+    hyd_h = hyd_ele
+    E = compute_E(hyd_lambda, hyd_varphi)
+    R_h = compute_R(hyd_lambda, hyd_varphi, hyd_h)
+    E.setflags(write=False)
+    R_h.setflags(write=False)
+    return E, R_h
+
+
+def compute_gradient_weights(t):
+    """Compute the weights used to compute the gradient of values
+    sampled at the given times, using second order accurate central
+    differences at interior times, and first order accurate one-sided
+    differences at the first and last times, as numpy.gradient() does
+    for unevenly spaced times.
+
+    Parameters
+    ----------
+    t : numpy.ndarray
+        Sample times
+
+    Returns
+    -------
+    weights : tuple
+        Weights of the preceding, current, and following values at
+        interior times, and the first and last time differences
+    """
+    dt = np.diff(t)
+    dt_1 = dt[:-1]
+    dt_2 = dt[1:]
+    a = -(dt_2) / (dt_1 * (dt_1 + dt_2))
+    b = (dt_2 - dt_1) / (dt_1 * dt_2)
+    c = dt_1 / (dt_2 * (dt_1 + dt_2))
+    return a, b, c, dt[0], dt[-1]
+
+
+def compute_gradient(f, weights):
+    """Compute the gradient of values along their last axis, using
+    weights computed once for the sample times, and a single scratch
+    array for the interior terms.
+
+    Parameters
+    ----------
+    f : numpy.ndarray
+        Sampled values, with time along the last axis
+    weights : tuple
+        Weights returned by compute_gradient_weights()
+
+    Returns
+    -------
+    f_dot : numpy.ndarray
+        Gradient of the sampled values
+    """
+    a, b, c, dt_0, dt_n = weights
+    f_dot = np.empty(f.shape)
+    interior = f_dot[..., 1:-1]
+    scratch = np.empty(interior.shape)
+    np.multiply(a, f[..., :-2], out=interior)
+    interior += np.multiply(b, f[..., 1:-1], out=scratch)
+    interior += np.multiply(c, f[..., 2:], out=scratch)
+    f_dot[..., 0] = (f[..., 1] - f[..., 0]) / dt_0
+    f_dot[..., -1] = (f[..., -1] - f[..., -2]) / dt_n
+    return f_dot
+
+
+def compute_ewm(x, span):
+    """Compute the exponentially weighted mean of a series, adjusted
+    for the finite number of preceding values, as computed by
+    pandas.DataFrame.ewm(span=span).mean(). Values which are not
+    finite, such as the gradient at repeated times, are skipped as
+    pandas skips missing values.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        Series values
+    span : float
+        Span used to compute the decay factor
+
+    Returns
+    -------
+    ewm : numpy.ndarray
+        Exponentially weighted mean
+
+    See also:
+    https://pandas.pydata.org/docs/user_guide/window.html#exponentially-weighted-window
+    """
+    # Filter the finite values recursively, then divide by the sum of
+    # the weights of the finite values, leaving the mean undefined
+    # until the first finite value
+    alpha = 2 / (span + 1)
+    is_finite = np.isfinite(x)
+    if is_finite.all():
+        numerator = lfilter([1.0], [1.0, alpha - 1], x)
+        denominator = (1 - (1 - alpha) ** np.arange(1, len(x) + 1)) / alpha
+        return numerator / denominator
+    numerator = lfilter([1.0], [1.0, alpha - 1], np.where(is_finite, x, 0.0))
+    denominator = lfilter([1.0], [1.0, alpha - 1], is_finite.astype(np.float64))
+    return np.divide(
+        numerator,
+        denominator,
+        out=np.full(len(x), np.nan),
+        where=denominator > 0,
+    )
+
+
 def compute_source_metrics(source, vld_t, vld_lambda, vld_varphi, vld_h, hydrophone):
     """Compute the topocentric position and velocity of the source
     relative to the hydrophone, and corresponding heading, heading
@@ -253,33 +583,33 @@ def compute_source_metrics(source, vld_t, vld_lambda, vld_varphi, vld_h, hydroph
     logger.info(
         f"Computing source {source['name']} metrics for hydrophone {Path(hydrophone['name'].lower()).stem}"
     )
-    # Assign longitude, latitude, and elevation of hydrophone
-    hyd_lambda = math.radians(hydrophone["lon"])
-    hyd_varphi = math.radians(hydrophone["lat"])
-    hyd_h = math.radians(hydrophone["ele"])
-
-    # Compute the orthogonal transformation matrix from geocentric to
-    # topocentric coordinates at hydrophone longitude, and latitude
-    E = lu.compute_E(hyd_lambda, hyd_varphi)
+    # Compute, or get, the orthogonal transformation matrix from
+    # geocentric to topocentric coordinates, and the geocentric
+    # position, of the hydrophone
+    E, R_h = lu.compute_hydrophone_frame(
+        hydrophone["lon"], hydrophone["lat"], hydrophone["ele"]
+    )
 
-    # Compute the geocentric position of the hydrophone, source, and
-    # source relative to the hydrophone
-    R_h = lu.compute_R(hyd_lambda, hyd_varphi, hyd_h)
-    R_s = lu.compute_R(vld_lambda, vld_varphi, vld_h)
-    R_s_h = R_s - np.atleast_2d(R_h).reshape(3, 1)
+    # Compute the geocentric position of the source, and source
+    # relative to the hydrophone
+    R_s_h = lu.compute_R(vld_lambda, vld_varphi, vld_h)
+    R_s_h -= R_h.reshape(3, 1)
 
     # Compute the topocentric position and velocity of the source
     # relative to the origin, and corresponding heading, heading first
     # derivative, distance, and speed
     # TODO: Use instantaneous orthogonal transformation matrix?
     r_s_h = np.matmul(E, R_s_h)
-    v_s_h = np.gradient(r_s_h, vld_t, axis=1)
-    distance = np.sqrt(np.sum(np.square(r_s_h), axis=0))
-    heading = 90 - np.degrees(np.arctan2(v_s_h[1, :], v_s_h[0, :]))
-    heading_dot = np.abs(
-        pd.DataFrame(np.gradient(heading, vld_t)).ewm(span=3).mean().to_numpy()
-    ).flatten()
-    speed = np.sqrt(np.sum(np.square(v_s_h), axis=0))
+    weights = compute_gradient_weights(vld_t)
+    v_s_h = compute_gradient(r_s_h, weights)
+    distance = np.einsum("ij,ij->j", r_s_h, r_s_h)
+    np.sqrt(distance, out=distance)
+    heading = np.arctan2(v_s_h[1, :], v_s_h[0, :])
+    np.degrees(heading, out=heading)
+    np.subtract(90, heading, out=heading)
+    heading_dot = np.abs(compute_ewm(compute_gradient(heading, weights), 3))
+    speed = np.einsum("ij,ij->j", v_s_h, v_s_h)
+    np.sqrt(speed, out=speed)
     return distance, heading, heading_dot, speed, r_s_h, v_s_h
 
 
@@ -313,42 +643,280 @@ def plot_source_metrics(
     logger.info(
         f"Plotting source {source['name']} metrics for hydrophone {Path(hydrophone['name'].lower()).stem}"
     )
-    fig, axs = plt.subplots()
-    axs.plot(r_s_h[0, :], r_s_h[1, :])
-    axs.axhline(color="gray", linestyle="dotted")
-    axs.axvline(color="gray", linestyle="dotted")
-    axs.set_title("Track")
-    axs.set_xlabel("east [m]")
-    axs.set_ylabel("north [m]")
+    # Import pyplot only when plotting, so runs without plots never
+    # load matplotlib
+    from matplotlib import pyplot as plt
+
+    # Plot the track and each histogram on one figure, so that it is
+    # drawn and shown once
+    fig, axs = plt.subplots(2, 3, figsize=(15, 9))
+    fig.suptitle(f"{source['name']}, {Path(hydrophone['name'].lower()).stem}")
+
+    axs[0, 0].plot(r_s_h[0, :], r_s_h[1, :])
+    axs[0, 0].axhline(color="gray", linestyle="dotted")
+    axs[0, 0].axvline(color="gray", linestyle="dotted")
+    axs[0, 0].set_title("Track")
+    axs[0, 0].set_xlabel("east [m]")
+    axs[0, 0].set_ylabel("north [m]")
+
+    axs[0, 1].hist(distance, bins=100)
+    axs[0, 1].set_title("Distance")
+    axs[0, 1].set_xlabel("distance [m]")
+    axs[0, 1].set_ylabel("counts")
+
+    axs[0, 2].hist(90 - heading, bins=180)
+    axs[0, 2].set_title("Headings")
+    axs[0, 2].set_xlabel("heading [deg]")
+    axs[0, 2].set_ylabel("counts")
+
+    axs[1, 0].hist(np.abs(heading_dot), bins=100)
+    axs[1, 0].set_title("Heading First Derivative")
+    axs[1, 0].set_xlabel("heading first derivative [deg/s]")
+    axs[1, 0].set_ylabel("counts")
+
+    axs[1, 1].hist(speed, bins=100)
+    axs[1, 1].set_title("Speed")
+    axs[1, 1].set_xlabel("speed [m/s]")
+    axs[1, 1].set_ylabel("counts")
+
+    axs[1, 2].set_axis_off()
+    fig.tight_layout()
     plt.show()
 
-    fig, axs = plt.subplots()
-    axs.hist(distance, bins=100)
-    axs.set_title("Distance")
-    axs.set_xlabel("distance [m]")
-    axs.set_ylabel("counts")
-    plt.show()
 
-    fig, axs = plt.subplots()
-    axs.hist(90 - heading, bins=180)
-    axs.set_title("Headings")
-    axs.set_xlabel("heading [deg]")
-    axs.set_ylabel("counts")
-    plt.show()
+class KMeans1D:
+    """Compute k-means clusters of one dimensional values using Lloyd's
+    algorithm on sorted values, so that each cluster is a contiguous
+    range of the sorted values, and each iteration requires only a
+    binary search for the range bounds and cumulative sums for the
+    cluster means. The fitted estimator exposes the cluster_centers_,
+    labels_, and inertia_ attributes of sklearn.cluster.KMeans.
 
-    fig, axs = plt.subplots()
-    axs.hist(np.abs(heading_dot), bins=100)
-    axs.set_title("Heading First Derivative")
-    axs.set_xlabel("heading first derivative [deg/s]")
-    axs.set_ylabel("counts")
-    plt.show()
+    Parameters
+    ----------
+    n_clusters : int
+        Number of clusters
+    n_init : int
+        Number of initializations, the first by quantiles, and the
+        remainder by k-means++, of which the fit with least inertia
+        is kept
+    max_iter : int
+        Maximum number of iterations for each initialization
+    random_state : int
+        Seed used for k-means++ initialization
 
-    fig, axs = plt.subplots()
-    axs.hist(speed, bins=100)
-    axs.set_title("Speed")
-    axs.set_xlabel("speed [m/s]")
-    axs.set_ylabel("counts")
-    plt.show()
+    See also:
+    https://scikit-learn.org/stable/modules/clustering.html#k-means
+    """
+
+    def __init__(self, n_clusters, n_init=10, max_iter=300, random_state=0):
+        self.n_clusters = n_clusters
+        self.n_init = n_init
+        self.max_iter = max_iter
+        self.random_state = random_state
+
+    def fit(self, X):
+        """Compute k-means clusters.
+
+        Parameters
+        ----------
+        X : numpy.ndarray
+            Values to cluster, of shape (n_samples,) or (n_samples, 1)
+
+        Returns
+        -------
+        self : KMeans1D
+            Fitted estimator
+        """
+        x = np.asarray(X, dtype=np.float64).ravel()
+        if not np.isfinite(x).all():
+            raise ValueError("Values to cluster must be finite")
+        if x.size < self.n_clusters:
+            raise Exception(
+                f"Number of values {x.size} must be at least the number of clusters {self.n_clusters}"
+            )
+        order = np.argsort(x, kind="stable")
+        x_sorted = x[order]
+        cumsum = np.concatenate(([0.0], np.cumsum(x_sorted)))
+        cumsum_sq = np.concatenate(([0.0], np.cumsum(x_sorted**2)))
+
+        # Initialize centers to the means of equal count quantiles,
+        # then by k-means++, keeping the fit with least inertia
+        rng = np.random.default_rng(self.random_state)
+        bounds = np.arange(self.n_clusters + 1) * x.size // self.n_clusters
+        best = None
+        for i_init in range(self.n_init):
+            if i_init == 0:
+                centers = (cumsum[bounds[1:]] - cumsum[bounds[:-1]]) / np.diff(bounds)
+            else:
+                centers = self._init_centers(x_sorted, rng)
+            fit = self._fit_centers(x_sorted, cumsum, cumsum_sq, centers)
+            if best is None or fit[2] < best[2]:
+                best = fit
+        centers, bounds, inertia = best
+
+        # Assign labels in the original order of the values
+        labels = np.empty(x.size, dtype=np.int32)
+        labels[order] = np.repeat(
+            np.arange(self.n_clusters, dtype=np.int32), np.diff(bounds)
+        )
+        self.cluster_centers_ = centers.reshape(-1, 1)
+        self.labels_ = labels
+        self.inertia_ = inertia
+        return self
+
+    def _init_centers(self, x_sorted, rng):
+        """Choose initial centers by k-means++."""
+        centers = np.empty(self.n_clusters)
+        centers[0] = x_sorted[rng.integers(x_sorted.size)]
+        d_sq = (x_sorted - centers[0]) ** 2
+        for i_center in range(1, self.n_clusters):
+            d_sq_sum = d_sq.sum()
+            if d_sq_sum > 0:
+                centers[i_center] = x_sorted[
+                    rng.choice(x_sorted.size, p=d_sq / d_sq_sum)
+                ]
+            else:
+                centers[i_center] = centers[0]
+            np.minimum(d_sq, (x_sorted - centers[i_center]) ** 2, out=d_sq)
+        return np.sort(centers)
+
+    def _fit_centers(self, x_sorted, cumsum, cumsum_sq, centers):
+        """Iterate Lloyd's algorithm from the given sorted centers,
+        returning the centers, cluster bounds in the sorted values,
+        and inertia."""
+        bounds = None
+        for _ in range(self.max_iter):
+
+            # Assign values to the nearest center by splitting the
+            # sorted values at the midpoints between successive centers
+            cur_bounds = np.concatenate(
+                (
+                    [0],
+                    np.searchsorted(x_sorted, (centers[1:] + centers[:-1]) / 2),
+                    [x_sorted.size],
+                )
+            )
+            if bounds is not None and np.array_equal(cur_bounds, bounds):
+                break
+            bounds = cur_bounds
+
+            # Move each center to the mean of its values, keeping the
+            # centers of empty clusters
+            counts = np.diff(bounds)
+            sums = cumsum[bounds[1:]] - cumsum[bounds[:-1]]
+            centers = np.sort(
+                np.where(counts > 0, sums / np.maximum(counts, 1), centers)
+            )
+        counts = np.diff(bounds)
+        sums = cumsum[bounds[1:]] - cumsum[bounds[:-1]]
+        sums_sq = cumsum_sq[bounds[1:]] - cumsum_sq[bounds[:-1]]
+        inertia = float(np.sum(sums_sq - 2 * centers * sums + counts * centers**2))
+        return centers, bounds, inertia
+
+
+class KMedoids1D:
+    """Compute k-medoids clusters of one dimensional values using the
+    alternating algorithm on sorted values, so that each cluster is a
+    contiguous range of the sorted values, and the medoid of each
+    cluster is one of its medians, without computing the pairwise
+    distances of all values. Medoids are initialized to the distinct
+    values with the least sum of distances to all values, so that no
+    cluster is empty. The fitted estimator exposes the
+    cluster_centers_, labels_, and inertia_ attributes of
+    sklearn_extra.cluster.KMedoids.
+
+    Parameters
+    ----------
+    n_clusters : int
+        Number of clusters, limited to the number of distinct values
+    max_iter : int
+        Maximum number of iterations
+
+    See also:
+    https://scikit-learn-extra.readthedocs.io/en/stable/modules/cluster.html#k-medoids
+    """
+
+    def __init__(self, n_clusters, max_iter=300):
+        self.n_clusters = n_clusters
+        self.max_iter = max_iter
+
+    def fit(self, X):
+        """Compute k-medoids clusters.
+
+        Parameters
+        ----------
+        X : numpy.ndarray
+            Values to cluster, of shape (n_samples,) or (n_samples, 1)
+
+        Returns
+        -------
+        self : KMedoids1D
+            Fitted estimator
+        """
+        x = np.asarray(X, dtype=np.float64).ravel()
+        if not np.isfinite(x).all():
+            raise ValueError("Values to cluster must be finite")
+        if x.size < self.n_clusters:
+            raise Exception(
+                f"Number of values {x.size} must be at least the number of clusters {self.n_clusters}"
+            )
+        order = np.argsort(x, kind="stable")
+        x_sorted = x[order]
+
+        # Initialize medoids to the distinct values with the least sum
+        # of distances to all values, computed from cumulative sums, so
+        # that no cluster is empty, using at most as many clusters as
+        # distinct values
+        cumsum = np.concatenate(([0.0], np.cumsum(x_sorted)))
+        n_below = np.arange(x.size)
+        costs = (
+            x_sorted * n_below
+            - cumsum[:-1]
+            + (cumsum[-1] - cumsum[1:])
+            - x_sorted * (x.size - 1 - n_below)
+        )
+        candidates = x_sorted[np.argsort(costs, kind="stable")]
+        _, first = np.unique(candidates, return_index=True)
+        medoids = np.sort(candidates[np.sort(first)[: self.n_clusters]])
+        n_clusters = medoids.size
+
+        for _ in range(self.max_iter):
+
+            # Assign values to the nearest medoid, or the lesser of two
+            # equally near medoids, by splitting the sorted values at
+            # the midpoints between successive medoids
+            bounds = np.concatenate(
+                (
+                    [0],
+                    np.searchsorted(
+                        x_sorted, (medoids[1:] + medoids[:-1]) / 2, side="right"
+                    ),
+                    [x.size],
+                )
+            )
+
+            # Keep each medoid which is a median of its cluster, or
+            # which has an empty cluster, otherwise move it to the
+            # lower median
+            counts = np.diff(bounds)
+            lower = x_sorted[np.minimum(bounds[:-1] + (counts - 1) // 2, x.size - 1)]
+            upper = x_sorted[np.minimum(bounds[:-1] + counts // 2, x.size - 1)]
+            keep = (counts == 0) | ((lower <= medoids) & (medoids <= upper))
+            if keep.all():
+                break
+            medoids = np.where(keep, medoids, lower)
+
+        # Assign labels in the original order of the values
+        labels_sorted = np.repeat(
+            np.arange(n_clusters, dtype=np.int32), np.diff(bounds)
+        )
+        labels = np.empty(x.size, dtype=np.int32)
+        labels[order] = labels_sorted
+        self.cluster_centers_ = medoids.reshape(-1, 1)
+        self.labels_ = labels
+        self.inertia_ = float(np.sum(np.abs(x_sorted - medoids[labels_sorted])))
+        return self
 
 
 def cluster_source_metrics(
@@ -386,26 +954,24 @@ def cluster_source_metrics(
 
     Returns
     -------
-    distance_clusters : sklearn.cluster.KMeans
+    distance_clusters : KMeans1D
         Fitted estimator for distance
-    heading_clusters : sklearn.cluster.KMeans
+    heading_clusters : KMeans1D
         Fitted estimator for heading
-    heading_dot_clusters : sklearn_extra.cluster.KMedoids
+    heading_dot_clusters : KMedoids1D
         Fitted estimator for heading first derivative
-    speed_clusters : sklearn.cluster.KMeans
+    speed_clusters : KMeans1D
         Fitted estimator for speed
     """
     logger.info(f"Computing clusters of heading, distance, and speed")
-    distance_clusters = KMeans(n_clusters=distance_n_clusters, random_state=0).fit(
-        distance.reshape(-1, 1)
+    distance_clusters = KMeans1D(n_clusters=distance_n_clusters, random_state=0).fit(
+        distance
     )
-    heading_clusters = KMeans(n_clusters=heading_n_clusters, random_state=0).fit(
-        90 - heading.reshape(-1, 1)
+    heading_clusters = KMeans1D(n_clusters=heading_n_clusters, random_state=0).fit(
+        90 - heading
     )
-    heading_dot_clusters = KMedoids(
-        n_clusters=heading_dot_n_clusters, random_state=0
-    ).fit(heading_dot.reshape(-1, 1))
-    speed_clusters = KMeans(n_clusters=speed_n_clusters, random_state=0).fit(
-        speed.reshape(-1, 1)
+    heading_dot_clusters = KMedoids1D(n_clusters=heading_dot_n_clusters).fit(
+        heading_dot
     )
+    speed_clusters = KMeans1D(n_clusters=speed_n_clusters, random_state=0).fit(speed)
     return distance_clusters, heading_clusters, heading_dot_clusters, speed_clusters
@@ -1,9 +1,15 @@
 """Provides simplified and documented methods for interacting with AWS S3.
 """
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import hashlib
 import logging
+import os
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
 
 root_logger = logging.getLogger()
@@ -18,6 +24,34 @@ if not root_logger.handlers:
 logger = logging.getLogger("S3Utilities")
 logger.setLevel(logging.INFO)
 
+# Client configuration allowing concurrent transfers to use more than
+# the default ten pooled connections
+CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={"max_attempts": 10, "mode": "adaptive"},
+    tcp_keepalive=True,
+)
+
+
+@functools.lru_cache(maxsize=None)
+def get_client():
+    """Returns the S3 client shared by all functions in this module.
+
+    The client is created on first use, then reused, so that the
+    service model is loaded, and connections are opened, only once.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    client : botocore.client.S3
+        The shared S3 client
+
+    """
+    return boto3.session.Session().client("s3", config=CLIENT_CONFIG)
+
 
 def create_bucket(bucket, region="us-east-1"):
     """Creates a new S3 bucket.
@@ -60,7 +94,7 @@ def create_bucket(bucket, region="us-east-1"):
         A requests.Response object
 
     """
-    client = boto3.client("s3")
+    client = get_client()
     try:
         if region == "us-east-1":
             response = client.create_bucket(
@@ -79,8 +113,43 @@ def create_bucket(bucket, region="us-east-1"):
     return response
 
 
-def put_object(file_obj, bucket, key):
-    """Adds an object to a bucket.
+def key_exists(bucket, key):
+    """Checks whether a key exists in a bucket using a HEAD request.
+
+    See:
+    https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Client.head_object
+
+    Parameters
+    ----------
+    bucket : str
+        Name of the S3 bucket
+    key : str
+        Name of the key
+
+    Returns
+    -------
+    exists : bool
+        True if the key exists, False if not, or None if the request
+        failed otherwise
+
+    """
+    client = get_client()
+    try:
+        client.head_object(Bucket=bucket, Key=key)
+        logger.info(f"Key {key} exists in bucket {bucket}")
+        return True
+    except Exception as e:
+        if isinstance(e, ClientError) and e.response["Error"]["Code"] == "404":
+            return False
+        logger.error(f"Could not load key {key} from bucket {bucket}: {e}")
+
+
+def put_object(file_obj, bucket, key, skip_if_exists=True):
+    """Adds an object to a bucket, unless the key exists in the bucket
+    and skipping was requested.
+
+    The existence of the key is checked by the conditional request
+    itself, so no separate request is needed.
 
     See:
     https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Client.put_object
@@ -99,6 +168,7 @@ def put_object(file_obj, bucket, key):
         ContentMD5='string',
         ContentType='string',
         Expires=datetime(2015, 1, 1),
+        IfNoneMatch='string',
         GrantFullControl='string',
         GrantRead='string',
         GrantReadACP='string',
@@ -146,6 +216,8 @@ def put_object(file_obj, bucket, key):
         Name of the S3 bucket
     key : str
         Name of the key for the file
+    skip_if_exists : bool
+        Skip the put if the key exists in the bucket
 
     Returns
     -------
@@ -154,29 +226,105 @@ def put_object(file_obj, bucket, key):
 
     """
     response = None
-    s3 = boto3.resource("s3")
+    client = get_client()
+    conditions = {"IfNoneMatch": "*"} if skip_if_exists else {}
     try:
-        s3.Object(bucket, key).load()
-        logger.info(f"Key {key} exists in bucket {bucket}")
-        return
-    except Exception as e:
-        if e.response["Error"]["Code"] == "404":
-            try:
-                client = boto3.client("s3")
-                response = client.put_object(
-                    Body=file_obj,
-                    Bucket=bucket,
-                    Key=key,
-                )
-                logger.info(f"Put key {key} to bucket {bucket}")
-            except Exception as e:
-                logger.info(f"Could not put key {key} to bucket {bucket}: {e}")
+        response = client.put_object(
+            Body=file_obj,
+            Bucket=bucket,
+            Key=key,
+            **conditions,
+        )
+        logger.info(f"Put key {key} to bucket {bucket}")
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "PreconditionFailed":
+            logger.info(f"Key {key} exists in bucket {bucket}")
         else:
-            logger.error(f"Could not load key {key} from bucket {bucket}: {e}")
+            logger.info(f"Could not put key {key} to bucket {bucket}: {e}")
+    except Exception as e:
+        logger.info(f"Could not put key {key} to bucket {bucket}: {e}")
     return response
 
 
-def create_multipart_upload(bucket, key):
+def upload_file(
+    file_path,
+    bucket,
+    key,
+    max_concurrency=10,
+    part_size=8 * 1024 * 1024,
+    skip_if_exists=True,
+):
+    """Uploads a file to a bucket, uploading the parts of a large file
+    concurrently.
+
+    Files smaller than the part size are put in a single request.
+    Other files are uploaded using a multipart upload, which is
+    created, uploaded, and completed, or aborted on failure, by the
+    managed transfer. The default part size matches the chunk size
+    assumed when checking the ETag of a downloaded object.
+
+    See:
+    https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Client.upload_file
+    https://boto3.amazonaws.com/v1/documentation/api/latest/reference/customizations/s3.html#boto3.s3.transfer.TransferConfig
+
+    Request Syntax
+    --------------
+    client.upload_file(
+        Filename='string',
+        Bucket='string',
+        Key='string',
+        ExtraArgs=None,
+        Callback=None,
+        Config=None
+    )
+
+    Parameters
+    ----------
+    file_path : pathlib.Path()
+        Path to the file to upload
+    bucket : str
+        Name of the S3 bucket
+    key : str
+        Name of the key for the file
+    max_concurrency : int
+        Maximum number of parts uploaded concurrently
+    part_size : int
+        Size of each part, and threshold for a multipart upload, in
+        bytes
+    skip_if_exists : bool
+        Skip the upload if the key exists in the bucket
+
+    Returns
+    -------
+    None
+
+    """
+    # Put small files in a single request, which is conditional on the
+    # key not existing if requested
+    if os.path.getsize(file_path) < part_size:
+        with open(file_path, "rb") as f:
+            put_object(f, bucket, key, skip_if_exists=skip_if_exists)
+        return
+
+    if skip_if_exists and key_exists(bucket, key) is not False:
+        return
+    config = TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=max_concurrency,
+        use_threads=True,
+    )
+    client = get_client()
+    try:
+        client.upload_file(str(file_path), bucket, key, Config=config)
+        logger.info(f"Uploaded file {file_path} to key {key} in bucket {bucket}")
+    except Exception as e:
+        logger.error(
+            f"Could not upload file {file_path} to key {key} in bucket {bucket}: {e}"
+        )
+
+
+def create_multipart_upload(bucket, key, skip_if_exists=True):
     """This action initiates a multipart upload and returns an upload
     ID.
 
@@ -247,6 +395,9 @@ def create_multipart_upload(bucket, key):
         Name of the S3 bucket
     key : str
         Name of the key for the multipart upload
+    skip_if_exists : bool
+        Check for the key before creating the upload, so that no parts
+        are uploaded for a key that exists
 
     Returns
     -------
@@ -255,28 +406,21 @@ def create_multipart_upload(bucket, key):
 
     """
     response = None
-    s3 = boto3.resource("s3")
-    try:
-        s3.Object(bucket, key).load()
-        logger.info(f"Key {key} exists in bucket {bucket}")
+    if skip_if_exists and key_exists(bucket, key) is not False:
         return
+    client = get_client()
+    try:
+        response = client.create_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+        )
+        logger.info(
+            f"Created multipart upload {response['UploadId']} for key {key} in bucket {bucket}"
+        )
     except Exception as e:
-        if e.response["Error"]["Code"] == "404":
-            client = boto3.client("s3")
-            try:
-                response = client.create_multipart_upload(
-                    Bucket=bucket,
-                    Key=key,
-                )
-                logger.info(
-                    f"Created multipart upload {response['UploadId']} for key {key} in bucket {bucket}"
-                )
-            except Exception as e:
-                logger.error(
-                    f"Could not create a multipart upload for key {key} in bucket {bucket}: {e}"
-                )
-        else:
-            logger.error(f"Could not load key {key} from bucket {bucket}: {e}")
+        logger.error(
+            f"Could not create a multipart upload for key {key} in bucket {bucket}: {e}"
+        )
     return response
 
 
@@ -347,7 +491,7 @@ def upload_part(file_obj, bucket, key, part_number, upload_id):
         A requests.Response object
 
     """
-    client = boto3.client("s3")
+    client = get_client()
     try:
         response = client.upload_part(
             Body=file_obj,
@@ -380,6 +524,10 @@ def complete_multipart_upload(bucket, key, multipart_upload, upload_id):
     the list. For each part in the list, you must provide the part
     number and the ETag value, returned after that part was uploaded.
 
+    The upload is only completed if the key does not exist in the
+    bucket, otherwise the upload is aborted. This guards against a
+    key created after the upload was created.
+
     See:
     https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Client.complete_multipart_upload
 
@@ -398,7 +546,8 @@ def complete_multipart_upload(bucket, key, multipart_upload, upload_id):
         },
         UploadId='string',
         RequestPayer='requester',
-        ExpectedBucketOwner='string'
+        ExpectedBucketOwner='string',
+        IfNoneMatch='string'
     )
 
     Response Syntax
@@ -433,17 +582,27 @@ def complete_multipart_upload(bucket, key, multipart_upload, upload_id):
         A requests.Response object
 
     """
-    client = boto3.client("s3")
+    response = None
+    client = get_client()
     try:
         response = client.complete_multipart_upload(
             Bucket=bucket,
             Key=key,
             MultipartUpload=multipart_upload,
             UploadId=upload_id,
+            IfNoneMatch="*",
         )
         logger.info(
             f"Completed multipart upload {upload_id} for key {key} in bucket {bucket}"
         )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "PreconditionFailed":
+            logger.info(f"Key {key} exists in bucket {bucket}")
+            abort_multipart_upload(bucket, key, upload_id)
+        else:
+            logger.error(
+                f"Could not complete multipart upload {upload_id} for key {key} in bucket {bucket}: {e}"
+            )
     except Exception as e:
         logger.error(
             f"Could not complete multipart upload {upload_id} for key {key} in bucket {bucket}: {e}"
@@ -500,7 +659,7 @@ def abort_multipart_upload(bucket, key, upload_id):
         A requests.Response object
 
     """
-    client = boto3.client("s3")
+    client = get_client()
     try:
         response = client.abort_multipart_upload(
             Bucket=bucket,
@@ -594,7 +753,7 @@ def list_parts(bucket, key, upload_id):
         A requests.Response object
 
     """
-    client = boto3.client("s3")
+    client = get_client()
     try:
         response = client.list_parts(
             Bucket=bucket,
@@ -611,21 +770,25 @@ def list_parts(bucket, key, upload_id):
     return response
 
 
-def list_objects(bucket, prefix=None):
-    """Returns some or all (up to 1,000) of the objects in a bucket.
+def list_objects(bucket, prefix=None, delimiter=None):
+    """Returns all of the objects in a bucket, paginating through
+    responses of up to 1,000 objects each.
 
     See:
-    https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Client.list_objects
+    https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Client.list_objects_v2
+    https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Paginator.ListObjectsV2
 
     Request Syntax
     --------------
-    response = client.list_objects(
+    response = client.list_objects_v2(
         Bucket='string',
         Delimiter='string',
         EncodingType='url',
-        Marker='string',
         MaxKeys=123,
         Prefix='string',
+        ContinuationToken='string',
+        FetchOwner=True|False,
+        StartAfter='string',
         RequestPayer='requester',
         ExpectedBucketOwner='string'
     )
@@ -634,8 +797,6 @@ def list_objects(bucket, prefix=None):
     ---------------
     {
         'IsTruncated': True|False,
-        'Marker': 'string',
-        'NextMarker': 'string',
         'Contents': [
             {
                 'Key': 'string',
@@ -661,7 +822,12 @@ def list_objects(bucket, prefix=None):
                 'Prefix': 'string'
             },
         ],
-        'EncodingType': 'url'
+        'EncodingType': 'url',
+        'KeyCount': 123,
+        'ContinuationToken': 'string',
+        'NextContinuationToken': 'string',
+        'StartAfter': 'string',
+        'RequestCharged': 'requester'
     }
 
     Parameters
@@ -670,25 +836,90 @@ def list_objects(bucket, prefix=None):
         Name of the S3 bucket
     prefix : str
         The AWS S3 prefix designating objects in the bucket
+    delimiter : str
+        The character used to group keys into common prefixes, which
+        are not listed further
 
     Returns
     -------
-    response : obj
-        A requests.Response object
+    response : dict
+        The responses of all pages, with contents, and common
+        prefixes, concatenated
     """
-    client = boto3.client("s3")
+    response = None
+    client = get_client()
     try:
-        if prefix is None:
-            response = client.list_objects(Bucket=bucket)
-        else:
-            response = client.list_objects(Bucket=bucket, Prefix=prefix)
+        response = (
+            client.get_paginator("list_objects_v2")
+            .paginate(**get_list_parameters(bucket, prefix, delimiter))
+            .build_full_result()
+        )
+        response.setdefault("Contents", [])
         logger.info(f"Listed objects from bucket {bucket}")
     except Exception as e:
         logger.info(f"Could not list objects from bucket {bucket}: {e}")
     return response
 
 
-def get_object(bucket, key):
+def iter_objects(bucket, prefix=None, delimiter=None):
+    """Yields the objects in a bucket, requesting each page of up to
+    1,000 objects only when the previous page has been consumed.
+
+    Parameters
+    ----------
+    bucket : str
+        Name of the S3 bucket
+    prefix : str
+        The AWS S3 prefix designating objects in the bucket
+    delimiter : str
+        The character used to group keys into common prefixes, which
+        are not listed further
+
+    Returns
+    -------
+    s3_object : dict
+        The AWS S3 object, as listed in the contents of a response
+
+    """
+    client = get_client()
+    try:
+        for page in client.get_paginator("list_objects_v2").paginate(
+            **get_list_parameters(bucket, prefix, delimiter)
+        ):
+            yield from page.get("Contents", [])
+        logger.info(f"Listed objects from bucket {bucket}")
+    except Exception as e:
+        logger.info(f"Could not list objects from bucket {bucket}: {e}")
+
+
+def get_list_parameters(bucket, prefix=None, delimiter=None):
+    """Returns the parameters of a list objects request, omitting
+    those not specified.
+
+    Parameters
+    ----------
+    bucket : str
+        Name of the S3 bucket
+    prefix : str
+        The AWS S3 prefix designating objects in the bucket
+    delimiter : str
+        The character used to group keys into common prefixes
+
+    Returns
+    -------
+    parameters : dict
+        The request parameters
+
+    """
+    parameters = {"Bucket": bucket, "PaginationConfig": {"PageSize": 1000}}
+    if prefix is not None:
+        parameters["Prefix"] = prefix
+    if delimiter is not None:
+        parameters["Delimiter"] = delimiter
+    return parameters
+
+
+def get_object(bucket, key, byte_range=None):
     """Retrieves objects from Amazon S3.
 
     See:
@@ -763,6 +994,8 @@ def get_object(bucket, key):
         Name of the S3 bucket
     key : str
         Name of the key for the file
+    byte_range : str
+        Optional range of bytes to retrieve, for example "bytes=0-1023"
 
     Returns
     -------
@@ -770,17 +1003,54 @@ def get_object(bucket, key):
         A requests.Response object
 
     """
-    client = boto3.client("s3")
+    client = get_client()
     try:
-        response = client.get_object(Bucket=bucket, Key=key)
-        logger.info(f"Got key {key} from bucket {bucket}")
+        if byte_range is None:
+            response = client.get_object(Bucket=bucket, Key=key)
+            logger.info(f"Got key {key} from bucket {bucket}")
+        else:
+            response = client.get_object(Bucket=bucket, Key=key, Range=byte_range)
+            logger.info(f"Got {byte_range} of key {key} from bucket {bucket}")
     except Exception as e:
         logger.info(f"Could not get key {key} from bucket {bucket}: {e}")
     return response
 
 
-def download_object(download_path, bucket, s3_object):
-    """Download an object from an AWS S3 bucket to a local path.
+def download_object_range(file_path, bucket, key, start, stop):
+    """Download a range of an object from an AWS S3 bucket, and write
+    it at the same offset in a local file.
+
+    Parameters
+    ----------
+    file_path : pathlib.Path()
+        The local file, at least stop bytes long, to which to write
+    bucket : str
+        The AWS S3 bucket
+    key : str
+        The key of the AWS S3 object
+    start : int
+        The first byte of the range
+    stop : int
+        The byte following the range
+
+    Returns
+    -------
+    digest : bytes
+        The MD5 digest of the range
+
+    """
+    r = get_object(bucket, key, byte_range=f"bytes={start}-{stop - 1}")
+    chunk = r["Body"].read()
+    with open(file_path, "r+b") as f:
+        f.seek(start)
+        f.write(chunk)
+    # nosemgrep:github.workflows.config.insecure-hash-algorithm-md5
+    return hashlib.md5(chunk).digest()
+
+
+def download_object(download_path, bucket, s3_object, max_workers=10):
+    """Download an object from an AWS S3 bucket to a local path, using
+    concurrent ranged requests.
 
     Parameters
     ----------
@@ -790,6 +1060,8 @@ def download_object(download_path, bucket, s3_object):
         The AWS S3 bucket
     s3_object : dict
         The AWS S3 object
+    max_workers : int
+        Maximum number of ranges downloaded concurrently
 
     Returns
     -------
@@ -804,32 +1076,37 @@ def download_object(download_path, bucket, s3_object):
     https://zihao.me/post/calculating-etag-for-aws-s3-objects/
     https://botocore.amazonaws.com/v1/documentation/api/latest/reference/response.html
     """
-    if "-" in s3_object["ETag"]:
-        is_hyphenated = True
-        md5s = []
-        chunk_size = 8 * 1024 * 1024
-    else:
-        is_hyphenated = False
-        # nosemgrep:github.workflows.config.insecure-hash-algorithm-md5
-        md5 = hashlib.md5()
-        chunk_size = 1024 * 1024
     key = s3_object["Key"]
-    r = get_object(bucket, key)
-    with open(download_path / key, "wb") as f:
-        for chunk in r["Body"].iter_chunks(chunk_size=chunk_size):
-            f.write(chunk)
-            if is_hyphenated:
-                # nosemgrep:github.workflows.config.insecure-hash-algorithm-md5
-                md5s.append(hashlib.md5(chunk).digest())
-            else:
-                # nosemgrep:github.workflows.config.insecure-hash-algorithm-md5
-                md5.update(chunk)
-    if is_hyphenated:
+    size = s3_object["Size"]
+    file_path = download_path / key
+
+    # Allocate the file, then download ranges matching the chunks of a
+    # hyphenated ETag concurrently, writing each at its offset
+    chunk_size = 8 * 1024 * 1024
+    with open(file_path, "wb") as f:
+        f.truncate(size)
+    starts = range(0, size, chunk_size)
+    stops = [min(start + chunk_size, size) for start in starts]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        md5s = list(
+            executor.map(
+                functools.partial(download_object_range, file_path, bucket, key),
+                starts,
+                stops,
+            )
+        )
+
+    if "-" in s3_object["ETag"]:
         # nosemgrep:github.workflows.config.insecure-hash-algorithm-md5
         md5 = hashlib.md5(b"".join(md5s))
         # nosemgrep:github.workflows.config.insecure-hash-algorithm-md5
         etag = f"{md5.hexdigest()}-{len(md5s)}"
     else:
+        # nosemgrep:github.workflows.config.insecure-hash-algorithm-md5
+        md5 = hashlib.md5()
+        with open(file_path, "rb") as f:
+            for chunk in iter(functools.partial(f.read, 1024 * 1024), b""):
+                md5.update(chunk)
         etag = md5.hexdigest()
     return etag
 
@@ -875,7 +1152,7 @@ def delete_object(bucket, key):
         A requests.Response object
 
     """
-    client = boto3.client("s3")
+    client = get_client()
     try:
         response = client.delete_object(
             Bucket=bucket,
@@ -915,7 +1192,7 @@ def delete_bucket(bucket):
         A requests.Response object
 
     """
-    client = boto3.client("s3")
+    client = get_client()
     try:
         response = client.delete_bucket(
             Bucket=bucket,
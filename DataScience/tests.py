@@ -1,13 +1,31 @@
 import pytest
+import boto3
+from botocore.exceptions import ClientError
+from botocore.stub import ANY, Stubber
+import hashlib
+import io
 import os
 import json
 import pandas as pd
 import numpy as np
+import wave
 import LabelerUtilities as lu
 import AisAudioLabeler as aal
+import GpxAudioLabeler as gal
+import S3Utilities as s3
 from pathlib import Path
 
 
+def write_wav(wav_path, frames, frame_rate=8000):
+    """Write 16-bit frames, of shape (n_frames,) or (n_frames,
+    n_channels), to a WAV file."""
+    with wave.open(str(wav_path), "wb") as f:
+        f.setnchannels(1 if frames.ndim == 1 else frames.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(frame_rate)
+        f.writeframes(frames.astype(np.int16).tobytes())
+
+
 @pytest.fixture
 def ais_fixed_data():
     ais_parquet_path = f"./test-data/v1-test/ais-fixed.parquet"
@@ -74,6 +92,20 @@ def data_home():
     return Path(os.getcwd())
 
 
+@pytest.fixture
+def s3_stubber(monkeypatch):
+    client = boto3.client(
+        "s3",
+        region_name="us-east-1",
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+    )
+    monkeypatch.setattr(s3, "get_client", lambda: client)
+    with Stubber(client) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+
+
 class TestAisAudioLabeler:
     def test_get_ais_dataframe(self, ais_test_data, data_home, source):
         ais = aal.get_ais_dataframe(data_home, source)
@@ -87,6 +119,25 @@ class TestAisAudioLabeler:
         hmd = aal.get_hmd_dataframe(data_home, hydrophone)
         assert hmd.equals(hmd_test_data)
 
+    def test_get_hydrophone_metadata(self, tmp_path, monkeypatch):
+        probed = []
+
+        def probe_audio_file(inp_path):
+            probed.append(inp_path.name)
+            if inp_path.name.startswith("bad"):
+                return {}
+            return {"sample_rate": "16000", "duration": "300.0"}
+
+        monkeypatch.setattr(lu, "probe_audio_file", probe_audio_file)
+        names = ["h-200-h.flac", "h-100-h.flac", "bad-300-h.flac", "notes.txt"]
+        for name in names:
+            (tmp_path / name).touch()
+        hmd = aal.get_hydrophone_metadata(tmp_path)
+        assert sorted(probed) == sorted(names[:3])
+        assert hmd["name"].tolist() == ["h-100-h.flac", "h-200-h.flac"]
+        assert hmd["start_timestamp"].tolist() == [100, 200]
+        assert hmd["sample_rate"].tolist() == [16000, 16000]
+
     def test_augment_ais_data_consistency(
         self,
         source,
@@ -152,3 +203,368 @@ class TestAisAudioLabeler:
         }
 
         assert shp == shp_expected, "augment_ais_data_status() shp.json test failed"
+
+    def test_export_audio_clips_format_mismatch(self, tmp_path):
+        hydrophone = {"name": "test", "label": "test"}
+        hyd_path = tmp_path / "test" / "test" / "hydrophone"
+        hyd_path.mkdir(parents=True)
+        for name, frame_rate in [("test-0.wav", 100), ("test-1.wav", 200)]:
+            write_wav(hyd_path / name, np.zeros(300 * frame_rate), frame_rate)
+        hmd = pd.DataFrame(
+            {"name": ["test-0.wav", "test-1.wav"], "start_timestamp": [0, 300]}
+        )
+        ais = pd.DataFrame(
+            {
+                "timestamp": [10],
+                "mmsi": ["1"],
+                "shiptype": ["Cargo"],
+                "status": ["UnderWayUsingEngine"],
+                "distance": [100.0],
+                "mmsis_uw": [["1"]],
+                "shipcount_uw": [1],
+            }
+        )
+        shp = {"1": {"UnderWayUsingEngine": [[10, 1000]]}}
+        clip_home = tmp_path / "clips"
+        clip_home.mkdir()
+        aal.export_audio_clips(ais, hmd, shp, tmp_path, hydrophone, clip_home, 1, 200)
+        clip_paths = list(clip_home.glob("*.wav"))
+        assert len(clip_paths) == 1
+        assert len(lu.get_audio_file(clip_paths[0])) == 540 * 1000
+
+
+class TestLabelerUtilities:
+    def test_compute_hydrophone_frame(self):
+        E, R_h_0 = lu.compute_hydrophone_frame(-70.0, 41.0, 0.0)
+        _, R_h_1 = lu.compute_hydrophone_frame(-70.0, 41.0, -10.0)
+        assert np.allclose(np.matmul(E, R_h_1 - R_h_0), [0.0, 0.0, -10.0])
+
+    def test_compute_gradient(self):
+        rng = np.random.default_rng(0)
+        t = np.cumsum(rng.uniform(0.5, 1.5, 100))
+        f = rng.normal(size=(3, 100))
+        weights = lu.compute_gradient_weights(t)
+        assert np.allclose(lu.compute_gradient(f, weights), np.gradient(f, t, axis=1))
+        assert np.allclose(lu.compute_gradient(f[0], weights), np.gradient(f[0], t))
+
+    def test_compute_ewm(self):
+        x = np.random.default_rng(0).normal(size=1000)
+        ewm_expected = pd.DataFrame(x).ewm(span=3).mean().to_numpy().flatten()
+        assert np.allclose(lu.compute_ewm(x, 3), ewm_expected), "compute_ewm() test failed"
+
+    def test_compute_ewm_repeated_time(self):
+        t = np.array([0.0, 1.0, 2.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+        f = np.sin(t)
+        with pytest.warns(RuntimeWarning):
+            f_dot = lu.compute_gradient(f, lu.compute_gradient_weights(t))
+        assert not np.isfinite(f_dot).all()
+        ewm = lu.compute_ewm(f_dot, 3)
+        f_dot[~np.isfinite(f_dot)] = np.nan
+        ewm_expected = pd.Series(f_dot).ewm(span=3).mean().to_numpy()
+        assert np.isfinite(ewm).all()
+        assert np.allclose(ewm, ewm_expected)
+        x = np.array([np.nan, 1.0, np.inf, 3.0])
+        ewm_expected = pd.Series([np.nan, 1.0, np.nan, 3.0]).ewm(span=3).mean()
+        assert np.allclose(lu.compute_ewm(x, 3), ewm_expected, equal_nan=True)
+        with pytest.raises(ValueError):
+            lu.KMeans1D(2).fit(x)
+        with pytest.raises(ValueError):
+            lu.KMedoids1D(2).fit(x)
+
+    def test_export_audio_clip_fast(self, tmp_path):
+        wav_path = tmp_path / "test.wav"
+        rng = np.random.default_rng(0)
+        samples = rng.integers(-(2**15), 2**15, size=(8000, 2), dtype=np.int16)
+        write_wav(wav_path, samples)
+        audio = lu.get_audio_file(wav_path)
+        wav_header = lu.get_wav_header(wav_path)
+        for start_t, stop_t in [(0, 1000), (123, 457), (900, 2000), (500, 500)]:
+            lu.export_audio_clip(audio, start_t, stop_t, tmp_path / "slow.wav")
+            lu.export_audio_clip_fast(
+                wav_path, wav_header, start_t, stop_t, tmp_path / "fast.wav"
+            )
+            assert (tmp_path / "fast.wav").read_bytes() == (
+                tmp_path / "slow.wav"
+            ).read_bytes(), "export_audio_clip_fast() test failed"
+
+    def test_get_audio_file_unsupported(self, tmp_path):
+        with pytest.raises(Exception, match="Unsupported audio file type"):
+            lu.get_audio_file(tmp_path / "test.mp3")
+
+    def test_get_audio_clip(self, tmp_path):
+        wav_path = tmp_path / "test.wav"
+        rng = np.random.default_rng(0)
+        samples = rng.integers(-(2**15), 2**15, size=8000, dtype=np.int16)
+        write_wav(wav_path, samples)
+        audio = lu.get_audio_file(wav_path)
+        clip = lu.get_audio_clip(wav_path, 250, 750)
+        assert clip.raw_data == audio[250:750].raw_data, "get_audio_clip() test failed"
+
+    def test_export_audio_file_clip(self, tmp_path):
+        wav_path = tmp_path / "test.wav"
+        rng = np.random.default_rng(0)
+        samples = rng.integers(-(2**15), 2**15, size=8000, dtype=np.int16)
+        write_wav(wav_path, samples)
+        audio = lu.get_audio_file(wav_path)
+        wav_header = lu.get_wav_header(wav_path)
+        for header in [wav_header, None]:
+            lu.export_audio_file_clip(wav_path, header, 250, 750, tmp_path / "clip.wav")
+            clip = lu.get_audio_file(tmp_path / "clip.wav")
+            assert clip.raw_data == audio[250:750].raw_data
+
+    def test_export_audio_clip_fast_concatenated(self, tmp_path):
+        rng = np.random.default_rng(0)
+        wav_paths = [tmp_path / "test-0.wav", tmp_path / "test-1.wav"]
+        for wav_path, n_frames in zip(wav_paths, [8000, 4001]):
+            samples = rng.integers(-(2**15), 2**15, size=n_frames, dtype=np.int16)
+            write_wav(wav_path, samples)
+        audio = lu.get_audio_file(wav_paths[0]) + lu.get_audio_file(wav_paths[1])
+        wav_headers = [lu.get_wav_header(wav_path) for wav_path in wav_paths]
+        for start_t, stop_t in [(0, 1000), (123, 1457), (1000, 1500), (900, 2000)]:
+            lu.export_audio_clip(audio, start_t, stop_t, tmp_path / "slow.wav")
+            lu.export_audio_clip_fast(
+                wav_paths, wav_headers, start_t, stop_t, tmp_path / "fast.wav"
+            )
+            assert (tmp_path / "fast.wav").read_bytes() == (
+                tmp_path / "slow.wav"
+            ).read_bytes(), "export_audio_clip_fast() concatenation test failed"
+
+    def test_kmeans_1d(self):
+        rng = np.random.default_rng(0)
+        x = np.concatenate((rng.normal(0, 1, 500), rng.normal(20, 1, 300)))
+        clusters = lu.KMeans1D(n_clusters=2).fit(x)
+        centers = clusters.cluster_centers_.flatten()
+        assert clusters.cluster_centers_.shape == (2, 1)
+        assert np.allclose(centers, [x[:500].mean(), x[500:].mean()])
+        assert (clusters.labels_ == np.repeat([0, 1], [500, 300])).all()
+        assert clusters.labels_.dtype == np.int32
+        assert np.isclose(clusters.inertia_, np.sum((x - centers[clusters.labels_]) ** 2))
+
+    def test_kmedoids_1d(self):
+        rng = np.random.default_rng(0)
+        x = np.concatenate((rng.normal(0, 1, 501), rng.normal(20, 1, 301)))
+        clusters = lu.KMedoids1D(n_clusters=2).fit(x)
+        centers = clusters.cluster_centers_.flatten()
+        assert clusters.cluster_centers_.shape == (2, 1)
+        assert (centers == [np.median(x[:501]), np.median(x[501:])]).all()
+        assert (clusters.labels_ == np.repeat([0, 1], [501, 301])).all()
+        assert clusters.labels_.dtype == np.int32
+        assert np.isclose(clusters.inertia_, np.sum(np.abs(x - centers[clusters.labels_])))
+
+    def test_kmedoids_1d_repeated_values(self):
+        x = np.repeat([0.0, 5.0, 9.0], [100, 100, 3])
+        clusters = lu.KMedoids1D(n_clusters=3).fit(x)
+        assert clusters.cluster_centers_.flatten().tolist() == [0.0, 5.0, 9.0]
+        assert np.bincount(clusters.labels_).tolist() == [100, 100, 3]
+        clusters = lu.KMedoids1D(n_clusters=3).fit(x[:200])
+        assert clusters.cluster_centers_.flatten().tolist() == [0.0, 5.0]
+        assert np.bincount(clusters.labels_).tolist() == [100, 100]
+
+
+class TestGpxAudioLabeler:
+    def test_parse_source_gpx_file(self, tmp_path):
+        trkpt = (
+            '<trkpt lat="{:.1f}" lon="-1.0">{}<time>2022-02-22T18:09:0{:d}Z</time></trkpt>'
+        )
+        trksegs = [
+            "".join(trkpt.format(i, "<ele>0.0</ele>", i) for i in range(4)),
+            "".join(trkpt.format(i, "", i) for i in range(2)),
+        ]
+        gpx_path = tmp_path / "test.gpx"
+        gpx_path.write_text(
+            '<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1">'
+            "<trk><name>test</name>"
+            + "".join(f"<trkseg>{trkseg}</trkseg>" for trkseg in trksegs)
+            + "</trk></gpx>"
+        )
+        gpx, vld_t, vld_lambda, vld_varphi, vld_h = gal.parse_source_gpx_file(
+            gpx_path, {"start_t": 0, "stop_t": 10}
+        )
+        assert not (tmp_path / "test-pretty.gpx").exists()
+        assert len(gpx["trks"]) == 1
+        assert [trkseg["lat"].size for trkseg in gpx["trks"][0]["trksegs"]] == [4, 2]
+        assert gpx["trks"][0]["trksegs"][1]["ele"].tolist() == [-lu.R_OPLUS] * 2
+        assert vld_t.tolist() == [1.0, 2.0, 3.0]
+        assert np.allclose(vld_varphi, np.radians([1.0, 2.0, 3.0]))
+
+    def test_parse_source_gpx_file_tracks(self, tmp_path):
+        trkpt = '<trkpt lat="0.0" lon="0.0"><time>2022-02-22T18:09:02Z</time></trkpt>'
+        trks = [("a", [1, 2]), ("b", [3])]
+        gpx_path = tmp_path / "test.gpx"
+        gpx_path.write_text(
+            '<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1">'
+            + "".join(
+                f"<trk><name>{name}</name>"
+                + "".join(f"<trkseg>{trkpt * n}</trkseg>" for n in n_trkpts)
+                + "</trk>"
+                for name, n_trkpts in trks
+            )
+            + "</gpx>"
+        )
+        gpx, _, _, _, _ = gal.parse_source_gpx_file(
+            gpx_path, {"start_t": 0, "stop_t": 10}
+        )
+        assert [
+            (trk["name"], [trkseg["lat"].size for trkseg in trk["trksegs"]])
+            for trk in gpx["trks"]
+        ] == trks
+
+    def test_process_hydrophone_sources(self, tmp_path):
+        wav_path = tmp_path / "unit.wav"
+        write_wav(wav_path, np.zeros(6000), frame_rate=100)
+        sampling = [
+            {
+                "method": {
+                    "type": "conditionals",
+                    "distance_limits": [0, 1000],
+                    "heading_limits": [-180, 0, 0, 180],
+                    "heading_dot_limits": [-1, 1],
+                    "speed_limits": [0, 10],
+                },
+                "delta_t_max": 4.0,
+                "n_clips_max": 3,
+                "output_dir": "case",
+            }
+        ]
+        n_t = 50
+        for src_name, start in [("track-a", 0.0), ("track-b", 5.0)]:
+            vld_t = start + np.arange(n_t, dtype=np.float64)
+            gal.process_hydrophone(
+                src_name,
+                "unit",
+                wav_path,
+                60000,
+                0,
+                60000,
+                vld_t,
+                np.full(n_t, 100.0),
+                np.full(n_t, 45.0),
+                np.zeros(n_t),
+                np.full(n_t, 5.0),
+                np.zeros((3, n_t)),
+                sampling,
+                tmp_path,
+            )
+        for src_name, start_t in [("track-a", 0), ("track-b", 5000)]:
+            clips = pd.read_csv(tmp_path / "case" / f"{src_name}-unit-clips.csv")
+            assert clips["start_t"].tolist() == [start_t]
+            assert (tmp_path / "case" / clips["filename"][0]).exists()
+
+    def test_find_clip_ranges(self):
+        vld_t = np.array([0.0, 1.0, 2.0, 3.0, 10.0, 11.0, 12.0, 20.0, 21.0])
+        indices = [
+            np.array([0, 1, 2, 3, 4, 5, 6]),
+            np.array([], dtype=np.int64),
+            np.array([4, 5, 6, 7, 8]),
+        ]
+        clip_bounds, clip_start_t, clip_stop_t = gal.find_clip_ranges(
+            vld_t, indices, 4.0
+        )
+        assert clip_bounds.tolist() == [0, 2, 2, 3]
+        assert clip_start_t.tolist() == [0, 10000, 10000]
+        assert clip_stop_t.tolist() == [3000, 12000, 12000]
+
+
+class TestS3Utilities:
+    def test_upload_file(self, tmp_path, monkeypatch):
+        uploads = []
+
+        class Client:
+            def head_object(self, **kwargs):
+                raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+
+            def upload_file(self, *args, **kwargs):
+                uploads.append((args, kwargs))
+
+        monkeypatch.setattr(s3, "get_client", Client)
+        file_path = tmp_path / "test.wav"
+        file_path.write_bytes(bytes(2048))
+        s3.upload_file(file_path, "bucket", "key", max_concurrency=4, part_size=1024)
+        [(args, kwargs)] = uploads
+        assert args == (str(file_path), "bucket", "key")
+        config = kwargs["Config"]
+        assert config.multipart_threshold == 1024
+        assert config.multipart_chunksize == 1024
+        assert config.max_concurrency == 4
+        assert config.use_threads
+
+    def test_upload_file_small(self, tmp_path, s3_stubber):
+        file_path = tmp_path / "test.wav"
+        file_path.write_bytes(bytes(10))
+        params = {"Body": ANY, "Bucket": "bucket", "Key": "key", "IfNoneMatch": "*"}
+        s3_stubber.add_response("put_object", {"ETag": '"etag"'}, params)
+        s3.upload_file(file_path, "bucket", "key")
+        s3_stubber.add_client_error(
+            "put_object", "PreconditionFailed", http_status_code=412
+        )
+        s3.upload_file(file_path, "bucket", "key")
+
+    def test_create_multipart_upload_skip_if_exists(self, s3_stubber):
+        params = {"Bucket": "bucket", "Key": "key"}
+        s3_stubber.add_response("head_object", {}, params)
+        assert s3.create_multipart_upload("bucket", "key") is None
+        s3_stubber.add_client_error("head_object", "404", http_status_code=404)
+        s3_stubber.add_response(
+            "create_multipart_upload", {"UploadId": "upload"}, params
+        )
+        response = s3.create_multipart_upload("bucket", "key")
+        assert response["UploadId"] == "upload"
+        s3_stubber.add_response(
+            "create_multipart_upload", {"UploadId": "upload"}, params
+        )
+        response = s3.create_multipart_upload("bucket", "key", skip_if_exists=False)
+        assert response["UploadId"] == "upload"
+
+    @pytest.mark.parametrize(
+        "n_bytes, etag_suffix", [(17 * 1024 * 1024, "-3"), (10, "")]
+    )
+    def test_download_object(self, tmp_path, monkeypatch, n_bytes, etag_suffix):
+        data = np.random.default_rng(0).bytes(n_bytes)
+
+        def get_object(bucket, key, byte_range=None):
+            start, stop = map(int, byte_range.replace("bytes=", "").split("-"))
+            return {"Body": io.BytesIO(data[start : stop + 1])}
+
+        monkeypatch.setattr(s3, "get_object", get_object)
+        s3_object = {"Key": "test.bin", "Size": n_bytes, "ETag": f'"x{etag_suffix}"'}
+        etag = s3.download_object(tmp_path, "bucket", s3_object)
+        assert (tmp_path / "test.bin").read_bytes() == data
+        if etag_suffix:
+            chunks = [
+                data[i : i + 8 * 1024 * 1024]
+                for i in range(0, n_bytes, 8 * 1024 * 1024)
+            ]
+            md5s = b"".join(hashlib.md5(chunk).digest() for chunk in chunks)
+            assert etag == hashlib.md5(md5s).hexdigest() + etag_suffix
+        else:
+            assert etag == hashlib.md5(data).hexdigest()
+
+    def test_iter_objects(self, monkeypatch):
+        pages = [
+            {"Contents": [{"Key": "a"}, {"Key": "b"}]},
+            {"Contents": [{"Key": "c"}]},
+            {"CommonPrefixes": [{"Prefix": "d/"}]},
+        ]
+        requests = []
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                requests.append(kwargs)
+                return iter(pages)
+
+        class Client:
+            def get_paginator(self, name):
+                assert name == "list_objects_v2"
+                return Paginator()
+
+        monkeypatch.setattr(s3, "get_client", Client)
+        keys = [s3_object["Key"] for s3_object in s3.iter_objects("bucket", "p/", "/")]
+        assert keys == ["a", "b", "c"]
+        assert requests == [
+            {
+                "Bucket": "bucket",
+                "Prefix": "p/",
+                "Delimiter": "/",
+                "PaginationConfig": {"PageSize": 1000},
+            }
+        ]